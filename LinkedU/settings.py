@@ -100,14 +100,64 @@ DATABASES = {
 }  
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.getenv("CACHE_LOCATION", "linkedu"),
+    }
+}
+
+# Rate limiting backend: 'ratelimit.CacheBackend' shares budgets between workers through
+# the cache above, 'ratelimit.MemoryBackend' keeps them in the process.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "ratelimit.CacheBackend")
+
+# Seconds the cached friend list and inbox payloads live after their user's last change.
+FRIEND_CACHE_TIMEOUT = int(os.getenv("FRIEND_CACHE_TIMEOUT", 300))
+
+# Per-process cache of the user columns used by CachedJWTAuthentication.
+JWT_USER_CACHE_SIZE = int(os.getenv("JWT_USER_CACHE_SIZE", 10000))
+JWT_USER_CACHE_TTL = int(os.getenv("JWT_USER_CACHE_TTL", 60))
+# Per-process cache of verified access tokens, kept until the tokens expire. Revocations are
+# stored in the default cache, which must be shared between workers (CACHE_BACKEND).
+JWT_TOKEN_CACHE_SIZE = int(os.getenv("JWT_TOKEN_CACHE_SIZE", 10000))
+
+# Threads hashing passwords for the async login/sign-up views, and how many more calls may
+# wait for one before they are turned away with 503. Defaults to the CPU count and twice that.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", 0)) or None
+PASSWORD_HASHING_QUEUE_SIZE = int(os.getenv("PASSWORD_HASHING_QUEUE_SIZE", 0)) or None
+
+# Seconds after which each worker rebuilds its in-memory autocomplete index.
+AUTOCOMPLETE_REBUILD_INTERVAL = int(os.getenv("AUTOCOMPLETE_REBUILD_INTERVAL", 3600))
+
+# CSR snapshot of the friendship graph written by `build_friend_graph` and memory-mapped by
+# every worker, and how often, in seconds, workers look for a newer one.
+FRIEND_GRAPH_SNAPSHOT = os.getenv("FRIEND_GRAPH_SNAPSHOT", str(BASE_DIR / "friend_graph.bin"))
+FRIEND_GRAPH_CHECK_INTERVAL = int(os.getenv("FRIEND_GRAPH_CHECK_INTERVAL", 5))
+
+# Broker of the friend request event stream: 'friends.events.CacheBroker' shares events
+# between workers through the cache above, 'friends.events.MemoryBroker' keeps them in the
+# process. Unset, CacheBroker is used when the cache is shared and MemoryBroker otherwise.
+# Events kept per user, seconds they are kept, and how often streams poll the cache.
+FRIEND_EVENTS_BROKER = os.getenv("FRIEND_EVENTS_BROKER", "")
+FRIEND_EVENTS_HISTORY = int(os.getenv("FRIEND_EVENTS_HISTORY", 100))
+FRIEND_EVENTS_TTL = int(os.getenv("FRIEND_EVENTS_TTL", 3600))
+FRIEND_EVENTS_POLL_INTERVAL = int(os.getenv("FRIEND_EVENTS_POLL_INTERVAL", 1))
+
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-    ],
+        'renderers.ORJSONRenderer',
+    ] + (
+        # The browsable API is only useful while developing.
+        ['rest_framework.renderers.BrowsableAPIRenderer']
+        if str(DEBUG).lower() in ('1', 'true') else []
+    ),
     'DEFAULT_PAGINATION_CLASS': 'utils.StandardResultsSetPagination',
     'PAGE_SIZE': 10
 }
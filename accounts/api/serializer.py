@@ -4,6 +4,7 @@ from utils import Settings as st
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.db import models
 from datetime import datetime
 
 
@@ -112,6 +113,8 @@ class SignUpSerializer(serializers.ModelSerializer):
             "email": {"required": True},
             "password": {"required": True},
         }
+        # Uniqueness is checked case-insensitively in `validate_email`.
+        extra_kwargs = {"email": {"validators": []}}
 
     def create(self, validated_data):
         """
@@ -127,7 +130,7 @@ class SignUpSerializer(serializers.ModelSerializer):
         """
 
         validated_data.pop("confirm_password")
-        email = self.validated_data.get("email").lower()
+        email = self.validated_data.get("email")
         password = self.validated_data.get("password")
         username = self.validated_data.get("username")
         return User.objects.create_user(
@@ -144,17 +147,20 @@ class SignUpSerializer(serializers.ModelSerializer):
 
         ------
         Raises:
-            serializers.ValidationError: If the email is invalid.
+            serializers.ValidationError: If the email is invalid or already registered.
 
         -------
         Returns:
             str: The validated email in lowercase.
         """
 
-        is_valid = st.email_validate(email=value.lower())
+        email = User.objects.normalize_email(value)
+        is_valid = st.email_validate(email=email)
         if not is_valid:
             raise serializers.ValidationError("Invalid Email...!")
-        return value
+        if User.objects.filter(email__lower=email).exists():
+            raise serializers.ValidationError("User with this email already exists.")
+        return email
 
     def validate(self, data):
         """
@@ -177,6 +183,49 @@ class SignUpSerializer(serializers.ModelSerializer):
         return data
 
 
+# "%b" month names of the current locale, looked up instead of calling strftime per row.
+MONTH_ABBREVIATIONS = tuple(datetime(2000, month, 1).strftime("%b") for month in range(1, 13))
+
+
+def format_updated_on(value):
+    """ `value` formatted as "%d %b, %Y %H:%M:%S", or None. """
+    if value is None:
+        return None
+    return (
+        f"{value.day:02d} {MONTH_ABBREVIATIONS[value.month - 1]}, {value.year} "
+        f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}"
+    )
+
+
+def format_created_on(value):
+    """ `value` formatted as "%d %b, %Y, %H:%M:%S", or None. """
+    if value is None:
+        return None
+    return (
+        f"{value.day:02d} {MONTH_ABBREVIATIONS[value.month - 1]}, {value.year}, "
+        f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}"
+    )
+
+
+class UserValuesListSerializer(serializers.ListSerializer):
+    """
+    List serializer with a fast path for rows fetched with `.values()`.
+
+    Dict rows are turned into the output of `UserListSerializer` directly, without model
+    instances or serializer fields; model instances still go through the regular path.
+    Querysets should be reduced with `.values(*UserListSerializer.values_fields)`.
+    """
+
+    def to_representation(self, data):
+        rows = data.all() if isinstance(data, models.manager.BaseManager) else data
+        to_values_representation = self.child.to_values_representation
+        to_representation = self.child.to_representation
+        return [
+            to_values_representation(row) if isinstance(row, dict) else to_representation(row)
+            for row in rows
+        ]
+
+
 class UserListSerializer(serializers.ModelSerializer):
     """
     Serializer for listing user details.
@@ -193,8 +242,25 @@ class UserListSerializer(serializers.ModelSerializer):
     Meta:
         model (User): The User model to be used.
         fields (list): The list of fields to be included in the serialized data.
+        list_serializer_class: Serializes `.values()` rows without building instances.
     """
 
+    # Columns to fetch with `.values()` for the fast list path; `dob` is built from `created_on`.
+    values_fields = [
+        "id",
+        "username",
+        "first_name",
+        "last_name",
+        "email",
+        "mobile_no",
+        "gender",
+        "nationality",
+        "created_on",
+        "updated_on",
+        "current_city",
+        "slug",
+    ]
+
     dob = serializers.SerializerMethodField()
     created_on = serializers.SerializerMethodField()
     updated_on = serializers.SerializerMethodField()
@@ -216,6 +282,29 @@ class UserListSerializer(serializers.ModelSerializer):
             "current_city",
             "slug",
         ]
+        list_serializer_class = UserValuesListSerializer
+
+    def to_values_representation(self, row):
+        """
+        Same output as `to_representation`, for a `.values(*values_fields)` dict.
+        """
+
+        created_on = format_created_on(row["created_on"])
+        return {
+            "id": row["id"],
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "email": row["email"],
+            "mobile_no": row["mobile_no"],
+            "gender": row["gender"],
+            "nationality": row["nationality"],
+            "dob": created_on,
+            "created_on": created_on,
+            "updated_on": format_updated_on(row["updated_on"]),
+            "current_city": row["current_city"],
+            "slug": row["slug"],
+        }
 
     def get_updated_on(self, obj=None):
         """
@@ -229,7 +318,7 @@ class UserListSerializer(serializers.ModelSerializer):
         """
 
         if obj:
-            return datetime.strftime(obj.updated_on, "%d %b, %Y %H:%M:%S")
+            return format_updated_on(obj.updated_on)
         return None
 
     def get_created_on(self, obj=None):
@@ -244,7 +333,7 @@ class UserListSerializer(serializers.ModelSerializer):
         """
 
         if obj:
-            return datetime.strftime(obj.created_on, "%d %b, %Y, %H:%M:%S")
+            return format_created_on(obj.created_on)
         return None
 
     def get_dob(self, obj=None):
@@ -258,5 +347,5 @@ class UserListSerializer(serializers.ModelSerializer):
             str: The formatted dob date and time, or None if obj is None.
         """
         if obj:
-            return datetime.strftime(obj.created_on, "%d %b, %Y, %H:%M:%S")
+            return format_created_on(obj.created_on)
         return None
@@ -1,5 +1,14 @@
 from django.urls import path
-from accounts.api.views import LoginAPIView , SignUpAPIView, UserListAPIView
+from accounts.api.views import (
+    LoginAPIView,
+    AsyncLoginAPIView,
+    LogoutAPIView,
+    SignUpAPIView,
+    AsyncSignUpAPIView,
+    UserListAPIView,
+    UserAutocompleteAPIView,
+    UserExportAPIView,
+)
 from rest_framework_simplejwt.views import TokenRefreshView
 
 app_name="accounts"
@@ -7,7 +16,12 @@ app_name="accounts"
 
 urlpatterns = [
     path('login/api/v1', LoginAPIView.as_view(), name='token_obtain_pair'),
+    path('login/async/api/v1', AsyncLoginAPIView.as_view(), name='token_obtain_pair_async'),
+    path('logout/api/v1', LogoutAPIView.as_view(), name='logout'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path("signup/api/v1", SignUpAPIView.as_view(), name='sign-up'),
-    path('api/v1/users', UserListAPIView.as_view(), name="user-list")
+    path("signup/async/api/v1", AsyncSignUpAPIView.as_view(), name='sign-up-async'),
+    path('api/v1/users', UserListAPIView.as_view(), name="user-list"),
+    path('api/v1/users/export', UserExportAPIView.as_view(), name="user-export"),
+    path('api/v1/users/autocomplete', UserAutocompleteAPIView.as_view(), name="user-autocomplete"),
 ]
\ No newline at end of file
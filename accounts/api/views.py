@@ -6,11 +6,24 @@ from accounts.api.serializer import (
     CustomTokenObtainPairSerializer,
     UserListSerializer,
 )
-from utils import st, StandardResultsSetPagination
+from utils import st, StandardResultsSetPagination, KeysetPagination, ConditionalGetMixin
+from renderers import StreamingPayload, StreamingPayloadResponse
 from rest_framework_simplejwt.views import TokenObtainPairView
 from accounts.models import User
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from accounts.search import get_user_search
+from accounts.autocomplete import user_index
+from accounts.cache import users_version
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from accounts.authentication import CachedJWTAuthentication, verified_tokens
+from rest_framework.exceptions import NotFound
+from accounts.hashing import hashing_pool, PoolSaturated
+from ratelimit import RateLimit, RateLimitThrottle
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+import json
+import constants as const
 
 
 class LoginAPIView(TokenObtainPairView):
@@ -23,6 +36,7 @@ class LoginAPIView(TokenObtainPairView):
     """
 
     serializer_class = CustomTokenObtainPairSerializer
+    query_budget = 1
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -44,6 +58,28 @@ class LoginAPIView(TokenObtainPairView):
             return Response(data=payload, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LogoutAPIView(APIView):
+    """
+    API view for user logout.
+
+    This view revokes the access token used to call it, in every worker, until the token
+    expires. The refresh token is left to expire on its own.
+    """
+
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 1
+
+    def post(self, request, *args, **kwargs):
+        verified_tokens.revoke(request.auth)
+        payload = st.get_payload(
+            detail={},
+            message="User successfully loggedOut.",
+            is_authenticated=False,
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
 class SignUpAPIView(APIView):
     """
     API view for user sign-up.
@@ -53,6 +89,8 @@ class SignUpAPIView(APIView):
     If there is an unexpected error during user creation, an appropriate error response is returned.
     """
 
+    query_budget = 5
+
     def post(self, request, *args, **kwargs):
         serializer = SignUpSerializer(data=request.data)
 
@@ -78,49 +116,272 @@ class SignUpAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserListAPIView(APIView):
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncHashingView(View):
+    """
+    Base class of the async login and sign-up views.
+
+    The request is handled by `process` on the bounded `hashing_pool`, so the password
+    hashing never runs on the event loop. When the pool is saturated the view answers 503
+    at once with a `Retry-After` header.
+    """
+
+    retry_after = 1
+
+    def process(self, data):
+        """ Return the payload and status code for the parsed request body. """
+        raise NotImplementedError
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            payload = st.get_payload(detail={}, message="Invalid JSON body.")
+            return JsonResponse(payload, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payload, status_code = await hashing_pool.run(self.process, data)
+        except PoolSaturated:
+            payload = st.get_payload(detail={}, message="Server busy, please retry.")
+            response = JsonResponse(payload, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = str(self.retry_after)
+            return response
+        return JsonResponse(payload, status=status_code)
+
+
+class AsyncLoginAPIView(AsyncHashingView):
+    """
+    Async variant of `LoginAPIView`, hashing the password on the `hashing_pool`.
+    """
+
+    def process(self, data):
+        serializer = CustomTokenObtainPairSerializer(data=data)
+        if serializer.is_valid():
+            payload = st.get_payload(
+                detail=serializer.validated_data,
+                message="User successfully loggedIn.",
+                is_authenticated=True,
+            )
+            return payload, status.HTTP_200_OK
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+
+
+class AsyncSignUpAPIView(AsyncHashingView):
+    """
+    Async variant of `SignUpAPIView`, hashing the password on the `hashing_pool`.
+    """
+
+    def process(self, data):
+        serializer = SignUpSerializer(data=data)
+        if not serializer.is_valid():
+            return serializer.errors, status.HTTP_400_BAD_REQUEST
+
+        try:
+            serializer.save()
+            payload = st.get_payload(
+                detail=serializer.data,
+                message="User created successfully.",
+                is_authenticated=True,
+            )
+            return payload, status.HTTP_201_CREATED
+
+        except Exception as e:
+            payload = st.get_payload(
+                detail={},
+                message=f"An un expected error Occurse: {e}",
+                is_authenticated=True,
+            )
+            return payload, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+class UserListAPIView(ConditionalGetMixin, APIView):
     """
     API view for listing users.
 
     This view handles listing users with optional search functionality. It uses pagination
     to limit the number of users returned per request.
+
+    Page number pagination is used by default. `?pagination=cursor` (or `pagination_mode`
+    on the view) switches to keyset pagination on (created_on, id), which avoids the
+    OFFSET scan and the `COUNT(*)` on deep pages.
+
+    Polling clients get `304 Not Modified` while no user was added, changed or deleted,
+    which `users_version` tracks in the cache without querying the users table.
     """
     
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 4
+    pagination_mode = const.PAGE_PAGINATION
 
     def __init__(self, **kwargs) -> None:
         self.userserializer = UserListSerializer
         self.pagination = StandardResultsSetPagination()
+        self.cursor_pagination = KeysetPagination(
+            ordering=("-created_on", "-id"), count_mode=const.ESTIMATED_COUNT
+        )
         self.user_qs = User.objects.all().order_by("-created_on")
         super().__init__(**kwargs)
 
+    def get_pagination(self, request, ordering=None):
+        """
+        Returns the paginator selected by the `pagination` query param or the view default.
+
+        Ranked search results keep their `ordering` in cursor mode: the rank leads the keyset.
+        """
+
+        pagination_mode = request.query_params.get(
+            const.pagination_query_param, self.pagination_mode
+        )
+        if pagination_mode == const.CURSOR_PAGINATION:
+            if ordering is not None:
+                return KeysetPagination(ordering=ordering, count_mode=self.cursor_pagination.count_mode)
+            return self.cursor_pagination
+        return self.pagination
+
+    def get_search_ordering(self, search_keyword):
+        """
+        Returns the ordering of the results of `search_users`, None when it keeps `user_qs`'s.
+        """
+
+        if search_keyword and "@" not in search_keyword:
+            return get_user_search().ordering
+        return None
+
+    def get_etag_validators(self, request):
+        return [users_version.get()]
+
     def search_users(self, queryset, search_keyword):
         """
         Filters the queryset based on the search keyword.
         If the keyword contains '@', it searches by email.
-        Otherwise, it searches by name.
+        Otherwise, it searches the username, first name, last name and city with the
+        search backend of the database, ranked by relevance where supported.
         """
 
         if search_keyword:
             if "@" in search_keyword:
-                return queryset.filter(email__iexact=search_keyword)
+                return queryset.filter(email__lower=search_keyword.lower())
             else:
-                return queryset.filter(username__icontains=search_keyword)
+                return get_user_search().search(queryset, search_keyword)
         return queryset
 
     def get(self, request, *args, **kwargs):
+        not_modified = self.get_not_modified_response(request)
+        if not_modified is not None:
+            return not_modified
 
         search_keyword = request.query_params.get("search", "")
         searched_user = self.search_users(
             queryset=self.user_qs, search_keyword=search_keyword
         )
 
-        paginated_user_qs = self.pagination.paginate_queryset(searched_user, request)
+        ordering = self.get_search_ordering(search_keyword)
+        pagination = self.get_pagination(request, ordering)
+        # The keyset reads its position from the rows, so they also carry the rank.
+        fields = self.userserializer.values_fields
+        fields = [*fields, *(
+            name for name in (field.lstrip("-") for field in ordering or ()) if name not in fields
+        )]
+        try:
+            paginated_user_qs = pagination.paginate_queryset(searched_user.values(*fields), request)
+        except NotFound as e:
+            payload = st.get_payload(
+                detail=[],
+                message=f"{e.detail}",
+                is_authenticated=st.is_authenticated_status(request=request),
+            )
+            return Response(data=payload, status=status.HTTP_404_NOT_FOUND)
+
         serialized_user_qs = self.userserializer(paginated_user_qs, many=True).data
+        extra_information = {}
+        if isinstance(pagination, KeysetPagination):
+            extra_information = pagination.get_extra_information()
+
         payload = st.get_payload(
             detail=serialized_user_qs,
             message="User list",
             is_authenticated=st.is_authenticated_status(request=request),
+            extra_information=extra_information,
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class UserExportAPIView(APIView):
+    """
+    API view exporting every user.
+
+    The users are read with a server-side cursor and streamed as a `get_payload` envelope
+    with the `UserListSerializer` representation, so memory stays flat whatever the number
+    of users. The export includes every email address, so it is restricted to staff users
+    and to a few exports per hour.
+    """
+
+    permission_classes = [IsAdminUser]
+    authentication_classes = [CachedJWTAuthentication]
+    throttle_classes = [RateLimitThrottle]
+    rate_limit = RateLimit(
+        "user-export",
+        limit=const.export_rate_limit,
+        window=const.export_rate_window,
+    )
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs):
+        users = (
+            User.objects.order_by("-created_on", "-id")
+            .values(*UserListSerializer.values_fields)
+            .iterator(chunk_size=const.export_chunk_size)
+        )
+        payload = StreamingPayload(
+            rows=users,
+            serialize=UserListSerializer().to_values_representation,
+            message="User export",
+            is_authenticated=st.is_authenticated_status(request=request),
+            chunk_size=const.export_chunk_size,
+        )
+        return StreamingPayloadResponse(payload, status=status.HTTP_200_OK)
+
+
+class UserAutocompleteAPIView(APIView):
+    """
+    API view for the "find people" typeahead.
+
+    This view answers prefix lookups over usernames, first names and last names from the
+    per-process in-memory `user_index`, so no query beyond authentication is issued. The size
+    and build time of the index are reported in `extra_information`.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 1
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.query_params.get("q", "").strip()
+        try:
+            limit = min(
+                int(request.query_params.get("limit", const.autocomplete_limit)),
+                const.autocomplete_max_limit,
+            )
+        except ValueError:
+            limit = const.autocomplete_limit
+
+        if not prefix or limit <= 0:
+            payload = st.get_payload(
+                detail=[],
+                message="A search prefix is required.",
+                is_authenticated=st.is_authenticated_status(request=request),
+            )
+            return Response(data=payload, status=status.HTTP_400_BAD_REQUEST)
+
+        users = [
+            {"id": user_id, "username": username, "first_name": first_name, "last_name": last_name}
+            for user_id, username, first_name, last_name in user_index.search(prefix, limit)
+        ]
+        payload = st.get_payload(
+            detail=users,
+            message="User autocomplete",
+            is_authenticated=st.is_authenticated_status(request=request),
+            extra_information={"index": user_index.stats()},
         )
         return Response(data=payload, status=status.HTTP_200_OK)
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save, post_delete
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from accounts.authentication import invalidate_user_receiver
+        from accounts.autocomplete import post_save_user_receiver, post_delete_user_receiver
+        from accounts.cache import bump_users_version_receiver
+        from accounts.models import User
+        from accounts.search import create_search_indexes
+
+        post_migrate.connect(create_search_indexes, sender=self)
+        post_save.connect(post_save_user_receiver, sender=User)
+        post_delete.connect(post_delete_user_receiver, sender=User)
+        post_save.connect(invalidate_user_receiver, sender=User)
+        post_delete.connect(invalidate_user_receiver, sender=User)
+        post_save.connect(bump_users_version_receiver, sender=User)
+        post_delete.connect(bump_users_version_receiver, sender=User)
@@ -0,0 +1,194 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from accounts.models import User
+
+
+class ExpiringLRUCache:
+    """
+    Bounded, thread-safe LRU whose entries carry their own expiry time.
+
+    Expired entries are dropped when read, and the least recently used entry is evicted
+    once `max_size` is exceeded. `clock` returns the time the expiry times are expressed in.
+    """
+
+    def __init__(self, max_size, clock=time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class UserRecordCache(ExpiringLRUCache):
+    """
+    Cache of the user columns needed to authenticate a request.
+
+    Entries expire after `ttl` seconds and are dropped by the User save/delete signals, so a
+    change of `updated_on` or `is_active` is seen at once by the process that made it and
+    within `ttl` seconds by every other process.
+    """
+
+    cached_fields = {
+        "id", "password", "last_login", "is_superuser", "is_staff", "is_active",
+        "username", "first_name", "last_name", "email", "updated_on",
+    }
+
+    def __init__(self, max_size=None, ttl=None):
+        super().__init__(max_size or getattr(settings, "JWT_USER_CACHE_SIZE", 10000))
+        self.ttl = ttl if ttl is not None else getattr(settings, "JWT_USER_CACHE_TTL", 60)
+        # `Model.from_db` expects the columns in model order.
+        self.fields = tuple(
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in self.cached_fields
+        )
+
+    def set(self, user_id, values):
+        super().set(user_id, values, self.clock() + self.ttl)
+
+
+class VerifiedTokenCache(ExpiringLRUCache):
+    """
+    Cache of access tokens whose signature has already been verified.
+
+    Tokens are keyed on the SHA-256 of the raw token and kept until their `exp` claim, so a
+    client reusing its token skips the signature check. Every process holds its own entries;
+    revocations go through the shared Django cache so that all workers see them.
+    """
+
+    revoked_key_prefix = "jwt-revoked"
+
+    def __init__(self, max_size=None):
+        super().__init__(
+            max_size or getattr(settings, "JWT_TOKEN_CACHE_SIZE", 10000), clock=time.time
+        )
+
+    @staticmethod
+    def get_key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).hexdigest()
+
+    def get_revoked_key(self, token):
+        return f"{self.revoked_key_prefix}:{token[api_settings.JTI_CLAIM]}"
+
+    def is_revoked(self, token):
+        return cache.get(self.get_revoked_key(token)) is not None
+
+    def revoke(self, token):
+        """
+        Reject `token` from now on in every process, until it expires anyway.
+        """
+
+        timeout = max(int(token["exp"] - self.clock()), 1)
+        cache.set(self.get_revoked_key(token), True, timeout)
+
+
+user_records = UserRecordCache()
+verified_tokens = VerifiedTokenCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds `request.user` without a query per request.
+
+    The token is validated as usual, then the user is rebuilt from the columns held in
+    `user_records`; only a cache miss selects them from the database. The instance is a
+    regular `User` whose other columns are deferred, so views that need them load them
+    lazily on first access. Verified tokens are cached as well, see `VerifiedTokenCache`.
+    """
+
+    def get_validated_token(self, raw_token):
+        key = verified_tokens.get_key(raw_token)
+        token = verified_tokens.get(key)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            verified_tokens.set(key, token, token["exp"])
+
+        if verified_tokens.is_revoked(token):
+            raise InvalidToken(
+                {"detail": _("Token has been revoked"), "messages": []}, code="token_revoked"
+            )
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        values = user_records.get(user_id)
+        if values is None:
+            values = (
+                User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list(*user_records.fields)
+                .first()
+            )
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_records.set(user_id, values)
+
+        user = User.from_db(router.db_for_read(User), user_records.fields, values)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+def invalidate_user_receiver(sender, instance, *args, **kwargs):
+    # Again on commit, in case a concurrent request cached the row before the change landed.
+    user_id = instance.pk
+    user_records.invalidate(user_id)
+    transaction.on_commit(lambda: user_records.invalidate(user_id))
@@ -0,0 +1,175 @@
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from django.conf import settings
+from django.utils import timezone
+
+
+class PrefixIndex:
+    """
+    Per-process prefix index over usernames, first names and last names.
+
+    Every lowercase word of those fields is kept in one sorted list with a parallel
+    `array` of user ids, so a prefix lookup is two binary searches plus a slice. The
+    display fields of each user are kept alongside, which lets the autocomplete answer
+    without a database query.
+
+    The index is built lazily on first use, kept up to date with the User `post_save` and
+    `post_delete` signals of this process, and fully rebuilt in a background thread once it
+    is older than `settings.AUTOCOMPLETE_REBUILD_INTERVAL` seconds, which also picks up the
+    changes made by other workers.
+    """
+
+    fields = ("username", "first_name", "last_name")
+
+    def __init__(self, rebuild_interval=None) -> None:
+        self.rebuild_interval = rebuild_interval or getattr(
+            settings, "AUTOCOMPLETE_REBUILD_INTERVAL", 3600
+        )
+        self._lock = threading.RLock()
+        self._terms = None
+        self._user_ids = array("q")
+        self._users = {}
+        self._rebuilding = False
+        self._changes = {}
+        self.built_at = None
+        self.build_seconds = None
+
+    def get_terms(self, values):
+        terms = set()
+        for value in values:
+            terms.update((value or "").lower().split())
+        return terms
+
+    def build(self):
+        """ Load every user and swap the new arrays in. """
+
+        try:
+            self._build()
+        finally:
+            with self._lock:
+                # Also after a failed load, or no rebuild would ever be started again; the
+                # changes buffered for a failed load are older than the next snapshot.
+                self._rebuilding = False
+                self._changes = {}
+
+    def _build(self):
+        from accounts.models import User
+
+        started = time.perf_counter()
+        entries, users = [], {}
+        for user_id, *values in User.objects.values_list("id", *self.fields).iterator(
+            chunk_size=5000
+        ):
+            users[user_id] = tuple(values)
+            entries.extend((term, user_id) for term in self.get_terms(values))
+        entries.sort()
+
+        terms = [term for term, _ in entries]
+        user_ids = array("q", (user_id for _, user_id in entries))
+        with self._lock:
+            self._terms, self._user_ids, self._users = terms, user_ids, users
+            # Replay the saves and deletes that happened while the snapshot was loading.
+            changes, self._changes = self._changes, {}
+            for user_id, values in changes.items():
+                self._apply(user_id, values)
+            self.built_at = timezone.now()
+            self.build_seconds = time.perf_counter() - started
+
+    def ensure_fresh(self):
+        """ Build on first use, and rebuild in the background when the index gets old. """
+
+        with self._lock:
+            if self._terms is None:
+                self._rebuilding = True
+                self.build()
+                return
+            age = (timezone.now() - self.built_at).total_seconds()
+            if age < self.rebuild_interval or self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self.build, daemon=True).start()
+
+    def search(self, prefix, limit):
+        """
+        Returns up to `limit` (id, username, first_name, last_name) rows matching the prefix.
+        """
+
+        prefix = prefix.lower().strip()
+        self.ensure_fresh()
+        results = {}
+        with self._lock:
+            start = bisect_left(self._terms, prefix)
+            end = bisect_left(self._terms, prefix + "\U0010ffff", start)
+            for position in range(start, end):
+                user_id = self._user_ids[position]
+                if user_id not in results:
+                    results[user_id] = (user_id, *self._users[user_id])
+                    if len(results) >= limit:
+                        break
+        return list(results.values())
+
+    def update(self, user_id, values=None):
+        """ Replace the entries of a user; `values=None` removes the user. """
+
+        with self._lock:
+            if self._rebuilding:
+                self._changes[user_id] = values
+            if self._terms is not None:
+                self._apply(user_id, values)
+
+    def _apply(self, user_id, values):
+        # Every term added or removed shifts the list and the array, O(n) under the lock: fine for
+        # occasional profile edits, a bulk import should rather wait for the next rebuild.
+        old = self._users.pop(user_id, None)
+        for term in self.get_terms(old or ()):
+            start = bisect_left(self._terms, term)
+            end = bisect_right(self._terms, term, start)
+            for position in range(start, end):
+                if self._user_ids[position] == user_id:
+                    del self._terms[position]
+                    del self._user_ids[position]
+                    break
+
+        if values is None:
+            return
+        self._users[user_id] = tuple(values)
+        for term in self.get_terms(values):
+            position = bisect_right(self._terms, term)
+            self._terms.insert(position, term)
+            self._user_ids.insert(position, user_id)
+
+    def stats(self):
+        """ Size and build time of the index, for monitoring. """
+
+        with self._lock:
+            terms = self._terms or []
+            memory = (
+                sys.getsizeof(terms)
+                + sum(sys.getsizeof(term) for term in terms)
+                + self._user_ids.itemsize * len(self._user_ids)
+                + sys.getsizeof(self._users)
+                + sum(sys.getsizeof(values) for values in self._users.values())
+            )
+            return {
+                "users": len(self._users),
+                "terms": len(terms),
+                "memory_bytes": memory,
+                "build_seconds": self.build_seconds,
+                "built_at": self.built_at,
+            }
+
+
+user_index = PrefixIndex()
+
+
+def post_save_user_receiver(sender, instance, *args, **kwargs):
+    user_index.update(
+        instance.pk, tuple(getattr(instance, field) for field in PrefixIndex.fields)
+    )
+
+
+def post_delete_user_receiver(sender, instance, *args, **kwargs):
+    user_index.update(instance.pk)
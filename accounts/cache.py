@@ -0,0 +1,46 @@
+import time
+from django.core.cache import caches
+from django.db import transaction
+
+
+class UsersVersion:
+    """
+    Version number of the user table, kept in the shared cache for the user list ETag.
+
+    The User `post_save` and `post_delete` signals bump it once their transaction commits,
+    so a poll compares one cache read instead of aggregating the whole table. Like the
+    autocomplete index, it doesn't see `QuerySet.update()` and `bulk_create()`. The version
+    starts from the clock, so a version evicted from the cache never comes back to an old value.
+    """
+
+    key = "accounts:users:version"
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self):
+        version = self.cache.get(self.key)
+        if version is None:
+            self.cache.add(self.key, time.time_ns(), timeout=None)
+            version = self.cache.get(self.key)
+        return version
+
+    def bump(self):
+        try:
+            self.cache.incr(self.key)
+        except ValueError:
+            self.cache.add(self.key, time.time_ns(), timeout=None)
+
+    def bump_on_commit(self):
+        transaction.on_commit(self.bump)
+
+
+users_version = UsersVersion()
+
+
+def bump_users_version_receiver(sender, instance, *args, **kwargs):
+    users_version.bump_on_commit()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class PoolSaturated(Exception):
+    """ Raised when every worker of a `HashingPool` is busy and its queue is full. """
+
+
+class HashingPool:
+    """
+    Bounded thread pool for the password hashing done by login and sign-up.
+
+    PBKDF2 runs in OpenSSL with the GIL released, so threads hash in parallel while the
+    event loop keeps serving other requests. At most `workers + queue_size` calls are
+    admitted at once; beyond that `run` raises `PoolSaturated` immediately instead of
+    queueing, so callers can answer 503 while cheap endpoints stay responsive.
+    """
+
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers or getattr(settings, "PASSWORD_HASHING_WORKERS", None) or os.cpu_count()
+        if queue_size is None:
+            queue_size = getattr(settings, "PASSWORD_HASHING_QUEUE_SIZE", None)
+        if queue_size is None:
+            queue_size = 2 * self.workers
+        self.capacity = self.workers + queue_size
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hashing"
+                )
+            return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` on the pool and return its result.
+        """
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PoolSaturated()
+        try:
+            future = self.executor.submit(self.call, func, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Freed when the hash is done, not when the caller stops waiting: a cancelled request
+        # leaves its hash running, and that thread must still count against the capacity.
+        future.add_done_callback(lambda future: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def call(func, *args, **kwargs):
+        # Pool threads keep their own database connections, recycle them like a request would.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+hashing_pool = HashingPool()
@@ -0,0 +1,68 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.authentication import CachedJWTAuthentication, user_records, verified_tokens
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput of `JWTAuthentication` and `CachedJWTAuthentication`.
+
+    Every iteration authenticates a request carrying the bearer token of one of `--users`
+    seeded users, round robin, and reports authentications per second and queries per
+    authentication for each class. The seeded users are rolled back afterwards.
+    """
+
+    help = "Benchmark requests per second of the JWT authentication classes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000, help="Authentications per class.")
+        parser.add_argument("--users", type=int, default=100, help="Distinct users authenticating.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(email=f"bench-{index}@bench.auth", username=f"bench{index}", password="!")
+                for index in range(options["users"])
+            )
+            requests = [
+                self.get_request(f"Bearer {RefreshToken.for_user(user).access_token}") for user in users
+            ]
+
+            user_records.clear()
+            verified_tokens.clear()
+            for authentication in (JWTAuthentication(), CachedJWTAuthentication()):
+                self.run(authentication, requests, options["requests"])
+            self.stdout.write(f"User cache: {user_records.stats()}")
+            self.stdout.write(f"Token cache: {verified_tokens.stats()}")
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def get_request(authorization):
+        request = HttpRequest()
+        request.method = "GET"
+        request.META["HTTP_AUTHORIZATION"] = authorization
+        return request
+
+    def run(self, authentication, requests, total):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            for index in range(total):
+                authentication.authenticate(Request(requests[index % len(requests)]))
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{authentication.__class__.__name__}: {total / elapsed:,.0f} requests/s, "
+            f"{len(queries) / total:.2f} queries per request"
+        )
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import statistics
+import time
+from urllib.parse import urlencode
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.hashing import hashing_pool
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    """
+    Measure the latency of a cheap endpoint while a storm of logins hits the server.
+
+    The requests are plain ASGI calls to the project's application in a single event loop,
+    the way one ASGI worker would serve them: `--concurrency` clients log in back to back while a probe calls the
+    autocomplete endpoint every `--interval` seconds. The run is repeated without a storm,
+    with the sync login view and with the async one, and the probe latencies and login
+    outcomes are reported for each.
+    """
+
+    help = "Benchmark unrelated endpoint latency under a login storm, sync vs async login."
+
+    email = "login-storm@benchmark.check"
+    password = "login-storm-password"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent login clients.")
+        parser.add_argument("--interval", type=float, default=0.05, help="Seconds between probes.")
+
+    def handle(self, *args, **options):
+        # Rejected logins are expected here, keep them out of the output.
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        self.application = get_asgi_application()
+        user = User.objects.create_user(email=self.email, password=self.password, username="storm")
+        try:
+            token = str(RefreshToken.for_user(user).access_token)
+            runs = [
+                ("no storm", None),
+                ("sync login", reverse("accounts:token_obtain_pair")),
+                ("async login", reverse("accounts:token_obtain_pair_async")),
+            ]
+            for name, login_url in runs:
+                result = asyncio.run(self.run(login_url, token, options))
+                self.report(name, result)
+        finally:
+            user.delete()
+
+    async def run(self, login_url, token, options):
+        deadline = time.monotonic() + options["duration"]
+        logins, latencies = {}, []
+
+        async def storm():
+            credentials = json.dumps({"email": self.email, "password": self.password}).encode()
+            headers = [(b"content-type", b"application/json")]
+            while time.monotonic() < deadline:
+                status_code = await self.request("POST", login_url, headers=headers, body=credentials)
+                logins[status_code] = logins.get(status_code, 0) + 1
+                if status_code == 503:
+                    await asyncio.sleep(0.01)
+
+        async def probe():
+            headers = [(b"authorization", f"Bearer {token}".encode())]
+            url = reverse("accounts:user-autocomplete")
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                status_code = await self.request("GET", url, {"q": "storm"}, headers=headers)
+                if status_code != 200:
+                    raise CommandError(f"Probe answered {status_code}.")
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(options["interval"])
+
+        tasks = [probe()]
+        if login_url is not None:
+            tasks += [storm() for _ in range(options["concurrency"])]
+        await asyncio.gather(*tasks)
+        return {"logins": logins, "latencies": latencies}
+
+    async def request(self, method, path, query=None, headers=(), body=b""):
+        """
+        Call the ASGI application like a server would, and return the response status code.
+        """
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(query or {}).encode(),
+            "headers": [(b"host", b"localhost"), (b"content-length", str(len(body)).encode()), *headers],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        messages = asyncio.Queue()
+        messages.put_nowait({"type": "http.request", "body": body, "more_body": False})
+        response = {}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+
+        # After the body, `receive` waits for a disconnect that never comes.
+        await self.application(scope, messages.get, send)
+        return response["status"]
+
+    def report(self, name, result):
+        latencies = sorted(result["latencies"])
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        self.stdout.write(
+            f"{name}: probe p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {p95 * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms over "
+            f"{len(latencies)} probes; logins by status {dict(sorted(result['logins'].items()))}"
+        )
+        if name == "async login":
+            self.stdout.write(f"Hashing pool: {hashing_pool.workers} workers, "
+                              f"capacity {hashing_pool.capacity}, rejected {hashing_pool.rejected}")
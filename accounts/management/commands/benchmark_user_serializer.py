@@ -0,0 +1,83 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from accounts.api.serializer import UserListSerializer
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    """
+    Compare rows per second of `UserListSerializer` on model instances and on `.values()`.
+
+    `--rows` users are seeded inside a transaction that is rolled back afterwards. Both paths
+    are timed with and without the query, their outputs are compared, and the date formatters
+    are checked against `strftime` on every row.
+    """
+
+    help = "Benchmark UserListSerializer on model instances vs .values() rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Users to serialize.")
+        parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs.")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        with transaction.atomic():
+            self.seed(rows)
+            queryset = User.objects.order_by("-created_on", "-id")[:rows]
+            values = queryset.values(*UserListSerializer.values_fields)
+
+            instances_data = UserListSerializer(list(queryset), many=True).data
+            values_data = UserListSerializer(list(values), many=True).data
+            if [dict(row) for row in instances_data] != values_data:
+                raise CommandError("The values path does not match the instances path.")
+            self.check_formats(instances_data, list(queryset.values("created_on", "updated_on")))
+
+            for name, source in (("instances", queryset), ("values", values)):
+                fetched = list(source)
+                serialize = self.best(lambda: UserListSerializer(fetched, many=True).data, options)
+                total = self.best(lambda: UserListSerializer(list(source.all()), many=True).data, options)
+                self.stdout.write(
+                    f"{name}: {rows / serialize:,.0f} rows/s serializing, "
+                    f"{rows / total:,.0f} rows/s including the query"
+                )
+            transaction.set_rollback(True)
+
+    def seed(self, rows):
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            User(
+                email=f"serializer-{index}@benchmark.check",
+                username=f"serializer{index}",
+                first_name="Bench",
+                last_name=f"User{index}",
+                current_city="Lyon",
+                slug=f"serializer-{index}",
+                password="!",
+            )
+            for index in range(rows)
+        )
+        # Spread the timestamps over a few years so every month and time of day is covered.
+        for index, user in enumerate(users):
+            user.created_on = now - timedelta(hours=7 * index, seconds=index)
+            user.updated_on = now - timedelta(minutes=13 * index)
+        User.objects.bulk_update(users, ["created_on", "updated_on"], batch_size=1000)
+
+    def check_formats(self, data, timestamps):
+        for row, stamps in zip(data, timestamps):
+            expected = (
+                datetime.strftime(stamps["created_on"], "%d %b, %Y, %H:%M:%S"),
+                datetime.strftime(stamps["updated_on"], "%d %b, %Y %H:%M:%S"),
+            )
+            if (row["created_on"], row["updated_on"]) != expected:
+                raise CommandError(f"Date formatting differs from strftime: {row} {expected}")
+
+    def best(self, func, options):
+        timings = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
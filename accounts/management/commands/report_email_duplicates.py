@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import Lower
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    """
+    Report users whose emails only differ by case.
+
+    The unique index on LOWER("email") cannot be created while such rows exist, so this
+    command runs before `migrate` and fails with the list of colliding accounts, which have
+    to be merged or renamed by hand. With `--normalize` the remaining mixed-case emails that
+    do not collide are rewritten in lowercase. It is a no-op on a fresh database.
+    """
+
+    help = "Detect case-duplicate user emails before the case-insensitive unique index is added."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--normalize",
+            action="store_true",
+            help="Lowercase the emails of users that do not collide with another account.",
+        )
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        if User._meta.db_table not in tables:
+            self.stdout.write("User table does not exist yet, nothing to do.")
+            return
+
+        duplicates = list(
+            User.objects.annotate(email_lower=Lower("email"))
+            .values("email_lower")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .values_list("email_lower", flat=True)
+        )
+        if duplicates:
+            users = (
+                User.objects.annotate(email_lower=Lower("email"))
+                .filter(email_lower__in=duplicates)
+                .order_by("email_lower", "id")
+                .values_list("email_lower", "id", "email", "last_login")
+            )
+            for email_lower, user_id, email, last_login in users:
+                self.stdout.write(f"{email_lower}: user {user_id} <{email}> last login {last_login}")
+            raise CommandError(
+                f"{len(duplicates)} emails are used by more than one account when compared "
+                "case-insensitively. Resolve them before running migrate."
+            )
+
+        if options["normalize"]:
+            updated = User.objects.exclude(email=Lower("email")).update(email=Lower("email"))
+            self.stdout.write(f"Lowercased {updated} emails.")
+
+        self.stdout.write(self.style.SUCCESS("No case-duplicate emails found."))
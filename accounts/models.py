@@ -2,15 +2,25 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from django.db.models.functions import Lower
 from django.utils.text import slugify 
 import random,string
 from django.db.models.signals import pre_save
 
 # # Create your models here.
 
+
 class UserManager(BaseUserManager):
     """ Define a model manager for User model with no username field. """
 
+    @classmethod
+    def normalize_email(cls, email):
+        """ Lowercase the whole address, emails are compared case-insensitively. """
+        return (email or "").strip().lower()
+
+    def get_by_natural_key(self, username):
+        return self.get(email__lower=self.normalize_email(username))
+
     def _create_user(self, email, password=None, **extra_fields):
         """ Create and save a User with the given email and password. """
         
@@ -54,6 +64,8 @@ class User(AbstractUser):
     username=models.CharField(max_length=30, default='', null=True, blank=True)
     first_name = models.CharField(max_length=20, default="", null=True, blank=True)
     last_name = models.CharField(max_length=20, default="", null=True, blank=True)
+    # `unique=True` stays although `user_email_lower_uniq` is stricter: Django requires the
+    # USERNAME_FIELD itself to be unique (auth.E003), a functional constraint doesn't count.
     email = models.EmailField(_("email"), max_length=254, unique=True, blank=False)
     mobile_no = models.CharField(max_length=15, null=True, blank=True)
     gender = models.CharField(max_length=25, default="Prefered not to answer", choices=CHOOSE_GENDER, null=True, blank=True)
@@ -68,6 +80,18 @@ class User(AbstractUser):
     REQUIRED_FIELDS = [] # Email & Password are required by default.
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on", "id"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="user_email_lower_uniq"),
+        ]
+
+
+# Lets `email__lower=...` filter on LOWER("email") so lookups can use the functional index.
+# Registered on this field only, other CharFields don't get a `__lower` lookup.
+User._meta.get_field("email").register_lookup(Lower)
 
 
 def random_string_generator(size = 10, chars = string.ascii_lowercase + string.digits): 
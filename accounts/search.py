@@ -0,0 +1,83 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+
+class UserSearch:
+    """
+    Portable user search used on databases without pg_trgm (SQLite test runs).
+
+    Matches the keyword anywhere in the username, first name, last name or current city
+    and keeps the ordering of the given queryset.
+    """
+
+    fields = ("username", "first_name", "last_name", "current_city")
+    # Ordering of the results when the backend ranks them, None when it keeps the queryset's.
+    ordering = None
+
+    def get_filter(self, keyword):
+        query = Q()
+        for field in self.fields:
+            query |= Q(**{f"{field}__icontains": keyword})
+        return query
+
+    def search(self, queryset, keyword):
+        return queryset.filter(self.get_filter(keyword))
+
+
+class TrigramUserSearch(UserSearch):
+    """
+    PostgreSQL user search backed by pg_trgm GIN indexes.
+
+    `icontains` compiles to `UPPER(column::text) LIKE UPPER('%keyword%')`, which the
+    `UPPER(column) gin_trgm_ops` indexes created by `create_search_indexes` can answer
+    without a sequential scan. Matches are ranked by their best trigram word similarity.
+    """
+
+    ordering = ("-rank", "-created_on", "-id")
+
+    def search(self, queryset, keyword):
+        rank = Greatest(*(TrigramWordSimilarity(keyword, field) for field in self.fields))
+        return (
+            super()
+            .search(queryset, keyword)
+            .annotate(rank=rank)
+            .order_by(*self.ordering)
+        )
+
+
+def get_user_search():
+    """
+    Returns the search backend for the database in use.
+    """
+
+    if connection.vendor == "postgresql":
+        return TrigramUserSearch()
+    return UserSearch()
+
+
+def create_search_indexes(sender, using, **kwargs):
+    """
+    post_migrate receiver: install pg_trgm and the trigram indexes of the searched columns.
+
+    The indexes live outside the model state because SQLite has no GIN indexes; every
+    statement is idempotent, so it is safe to run on each migrate.
+    """
+
+    from accounts.models import User
+
+    db_connection = connections[using]
+    if db_connection.vendor != "postgresql":
+        return
+
+    table = User._meta.db_table
+    qn = db_connection.ops.quote_name
+    with db_connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in UserSearch.fields:
+            column = User._meta.get_field(field).column
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {qn(f'{table}_{column}_trgm')} "
+                f"ON {qn(table)} USING gin (UPPER({qn(column)}) gin_trgm_ops)"
+            )
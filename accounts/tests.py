@@ -1,3 +1,470 @@
+from datetime import datetime, timezone
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.db.models.functions import Length
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.api.serializer import UserListSerializer
+from accounts.authentication import CachedJWTAuthentication, user_records, verified_tokens
+from accounts.autocomplete import PrefixIndex
+from accounts.hashing import HashingPool
+from accounts.models import User
+from accounts.search import TrigramUserSearch, UserSearch
+from friends.api.serializers import SendFrientRequestSerializer
+from ratelimit import MemoryBackend
 
-# Create your tests here.
+
+def create_user(email="user@linkedu.test", password="Passw0rd!x", **extra_fields):
+    return User.objects.create_user(email=email, password=password, username="user", **extra_fields)
+
+
+class QueryBudgetMixin:
+    """
+    Calls endpoints against a small and a large seeded data set and fails unless both calls
+    issue the same number of queries, and no more than the `query_budget` of the view.
+
+    Each call seeds its rows in a savepoint that is rolled back afterwards. Subclasses list
+    their endpoints in `get_scenarios`; a scenario returns the method, url and data to send.
+    """
+
+    small, large = 2, 20
+    password = "query-budget-password"
+
+    def get_scenarios(self):
+        return []
+
+    def test_query_budgets(self):
+        for name, scenario in self.get_scenarios():
+            with self.subTest(name):
+                small = self.measure(scenario, self.small)
+                large = self.measure(scenario, self.large)
+                statements = "\n".join(query["sql"] for query in large["queries"])
+                self.assertEqual(
+                    len(small["queries"]), len(large["queries"]),
+                    f"{name} runs more queries on more rows:\n{statements}",
+                )
+                self.assertLessEqual(
+                    len(large["queries"]), large["budget"],
+                    f"{name} is over its budget of {large['budget']}:\n{statements}",
+                )
+
+    def measure(self, scenario, size):
+        # A fresh rate limit budget per call, so earlier calls don't throttle later ones.
+        rate_limit = mock.patch.object(
+            SendFrientRequestSerializer.rate_limit, "_backend", MemoryBackend()
+        )
+        # Ids are reused after the rollback, drop the payloads cached for the previous call.
+        cache.clear()
+        with rate_limit, transaction.atomic():
+            context = self.seed(size)
+            method, url, data = scenario(context)
+            view = resolve(url.split("?")[0]).func.view_class
+
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {context['token']}")
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(url, data, format="json")
+                if response.streaming:
+                    b"".join(response.streaming_content)
+
+            self.assertLess(response.status_code, 400, f"{method.upper()} {url}")
+            transaction.set_rollback(True)
+        return {"budget": view.query_budget, "queries": queries.captured_queries}
+
+    def seed(self, size):
+        """
+        The calling user and `4 * size` other users.
+        """
+
+        user = User.objects.create_user(
+            email="query-budget@budget.check", password=self.password, username="budget"
+        )
+        users = User.objects.bulk_create(
+            User(email=f"budget-{index}@budget.check", username=f"budget{index}", password="!")
+            for index in range(4 * size)
+        )
+        return {
+            "user": user,
+            "users": users,
+            "token": str(RefreshToken.for_user(user).access_token),
+        }
+
+
+class AccountQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def get_scenarios(self):
+        return [
+            ("login", lambda context: (
+                "post",
+                reverse("accounts:token_obtain_pair"),
+                {"email": context["user"].email, "password": self.password},
+            )),
+            ("logout", lambda context: (
+                "post", reverse("accounts:logout"), {}
+            )),
+            ("signup", lambda context: (
+                "post",
+                reverse("accounts:sign-up"),
+                {
+                    "username": "budget-new",
+                    "email": "budget-new@budget.check",
+                    "password": self.password,
+                    "confirm_password": self.password,
+                },
+            )),
+            ("user list", lambda context: (
+                "get", reverse("accounts:user-list"), {}
+            )),
+            ("user export", self.export_scenario),
+            ("user autocomplete", self.autocomplete_scenario),
+            ("user list (cursor)", lambda context: (
+                "get", reverse("accounts:user-list") + "?pagination=cursor&count=none", {}
+            )),
+        ]
+
+    def autocomplete_scenario(self, context):
+        # A fresh index, built before measuring: requests are answered from memory.
+        index = PrefixIndex()
+        index.build()
+        self.enterContext(mock.patch("accounts.api.views.user_index", index))
+        return "get", reverse("accounts:user-autocomplete") + "?q=budget", {}
+
+    def export_scenario(self, context):
+        # The export is restricted to staff users.
+        User.objects.filter(pk=context["user"].pk).update(is_staff=True)
+        return "get", reverse("accounts:user-export"), {}
+
+
+class UserListConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("accounts:user-list") + "?pagination=cursor&count=none"
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(self.url, **headers)
+
+    def test_unchanged_users_get_not_modified(self):
+        etag = self.get()["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_user_change_gets_the_list_again(self):
+        etag = self.get()["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Changed"
+            self.user.save()
+        response = self.get(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_user_delete_gets_the_list_again(self):
+        other = create_user(email="other@linkedu.test")
+        etag = self.get()["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+
+        self.assertEqual(self.get(etag).status_code, 200)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user_records.clear()
+        verified_tokens.clear()
+        self.addCleanup(user_records.clear)
+        self.addCleanup(verified_tokens.clear)
+        self.user = create_user(first_name="Ada")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.url = reverse("accounts:user-list") + "?pagination=cursor&count=none"
+
+    def authenticate(self, token=None):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token or self.token}")
+        return CachedJWTAuthentication().authenticate(Request(request))[0]
+
+    def test_user_is_cached(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.first_name, "Ada")
+
+    def test_user_change_invalidates_the_cached_user(self):
+        self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Grace"
+            self.user.save()
+
+        with self.assertNumQueries(1):
+            user = self.authenticate()
+        self.assertEqual(user.first_name, "Grace")
+
+    def test_deactivated_user_is_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deleted_user_is_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_logout_revokes_the_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        response = self.client.post(reverse("accounts:logout"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.post(reverse("accounts:logout")).status_code, 401)
+        # Other tokens of the user are still valid.
+        other_token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.authenticate(other_token).pk, self.user.pk)
+
+
+class HashingPoolTests(TestCase):
+
+    def setUp(self):
+        self.pool = HashingPool(workers=1, queue_size=0)
+        self.enterContext(mock.patch("accounts.api.views.hashing_pool", self.pool))
+        # Every slot is taken by a hash in flight.
+        self.pool._slots.acquire()
+        self.addCleanup(self.pool._slots.release)
+
+    async def test_saturated_pool_answers_503(self):
+        data = {"email": "user@linkedu.test", "password": "Passw0rd!x"}
+        for name in ("accounts:token_obtain_pair_async", "accounts:sign-up-async"):
+            with self.subTest(name=name):
+                response = await self.async_client.post(reverse(name), data, content_type="application/json")
+
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.pool.rejected, 2)
+        self.assertIsNone(self.pool._executor)
+
+
+class EmailCaseTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user(email="Ada.Lovelace@LinkedU.test")
+
+    def test_email_is_stored_lowercase(self):
+        self.assertEqual(self.user.email, "ada.lovelace@linkedu.test")
+
+    def test_login_ignores_the_email_case(self):
+        for email in ("ada.lovelace@linkedu.test", "ADA.LOVELACE@linkedu.TEST"):
+            with self.subTest(email=email):
+                response = self.client.post(
+                    reverse("accounts:token_obtain_pair"), {"email": email, "password": "Passw0rd!x"}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("access", response.json()["detail"])
+
+    def test_sign_up_differing_only_in_case_is_refused(self):
+        response = self.client.post(
+            reverse("accounts:sign-up"),
+            {
+                "username": "ada",
+                "email": "ADA.lovelace@linkedu.test",
+                "password": "Passw0rd!x",
+                "confirm_password": "Passw0rd!x",
+            },
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_database_refuses_a_case_variant(self):
+        # Rows written without the manager's normalization are caught by `user_email_lower_uniq`.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.bulk_create([User(email="ADA.LOVELACE@linkedu.test", username="ada")])
+
+
+class UserSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.users = {
+            name: create_user(email=f"{name}@linkedu.test", **fields)
+            for name, fields in {
+                "ada": {"first_name": "Ada", "last_name": "Lovelace", "current_city": "London"},
+                "alan": {"first_name": "Alan", "last_name": "Turing", "current_city": "Wilmslow"},
+                "grace": {"first_name": "Grace", "last_name": "Hopper", "current_city": "New York"},
+                "lovelace": {"first_name": "Lovelacey", "last_name": "Byron", "current_city": "London"},
+            }.items()
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, keyword, **params):
+        response = self.client.get(reverse("accounts:user-list"), {"search": keyword, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_ids(self, *names):
+        return [self.users[name].id for name in names]
+
+    def test_matches_names_and_city(self):
+        queryset = User.objects.order_by("id")
+        self.assertEqual(
+            list(UserSearch().search(queryset, "LOVE").values_list("id", flat=True)),
+            self.get_ids("ada", "lovelace"),
+        )
+        self.assertEqual(
+            list(UserSearch().search(queryset, "york").values_list("id", flat=True)),
+            self.get_ids("grace"),
+        )
+
+    def test_email_is_matched_exactly(self):
+        self.assertEqual([user["id"] for user in self.search("ALAN@linkedu.test")["detail"]], self.get_ids("alan"))
+        self.assertEqual(self.search("alan@linkedu")["detail"], [])
+
+    def test_cursor_pages_keep_the_search_ordering(self):
+        first = self.search("london", pagination="cursor", page_size=1)
+        second = self.search(
+            "london", pagination="cursor", page_size=1,
+            cursor=first["extra_information"]["next_cursor"],
+        )
+        self.assertEqual(
+            [first["detail"][0]["id"], second["detail"][0]["id"]],
+            [user["id"] for user in self.search("london")["detail"]],
+        )
+        self.assertIsNone(second["extra_information"]["next_cursor"])
+
+    def test_cursor_pages_keep_a_ranked_ordering(self):
+        class RankedSearch(UserSearch):
+            # Ranks by the length of the last name, a stand-in for the trigram similarity.
+            ordering = ("-rank", "-created_on", "-id")
+
+            def search(self, queryset, keyword):
+                return super().search(queryset, keyword).annotate(rank=Length("last_name")).order_by(*self.ordering)
+
+        with mock.patch("accounts.api.views.get_user_search", RankedSearch):
+            ids, cursor = [], None
+            while True:
+                page = self.search("l", pagination="cursor", page_size=1, **({"cursor": cursor} if cursor else {}))
+                ids += [user["id"] for user in page["detail"]]
+                cursor = page["extra_information"]["next_cursor"]
+                if cursor is None:
+                    break
+
+        self.assertEqual(ids, self.get_ids("ada", "alan", "lovelace"))
+
+    @skipUnless(connection.vendor == "postgresql", "Trigram search needs pg_trgm.")
+    def test_trigram_ranking_survives_cursor_pages(self):
+        # "Lovelace" matches Ada's last name exactly, and only part of "Lovelacey".
+        ranked = TrigramUserSearch().search(User.objects.all(), "lovelace")
+        self.assertEqual(list(ranked.values_list("id", flat=True)), self.get_ids("ada", "lovelace"))
+
+        first = self.search("lovelace", pagination="cursor", page_size=1)
+        second = self.search(
+            "lovelace", pagination="cursor", page_size=1,
+            cursor=first["extra_information"]["next_cursor"],
+        )
+        self.assertEqual(
+            [first["detail"][0]["id"], second["detail"][0]["id"]], self.get_ids("ada", "lovelace")
+        )
+
+
+class UserListSerializerTests(TestCase):
+
+    def test_values_rows_match_instances(self):
+        create_user(email="full@linkedu.test", first_name="Ada", mobile_no="0123", current_city="London")
+        create_user(email="empty@linkedu.test", first_name="", last_name=None, nationality="")
+        create_user(email="dates@linkedu.test")
+        User.objects.filter(email="full@linkedu.test").update(
+            created_on=datetime(2024, 1, 5, 7, 8, 9, 123456, tzinfo=timezone.utc),
+            updated_on=datetime(2024, 12, 31, 23, 59, 59, tzinfo=timezone.utc),
+        )
+        User.objects.filter(email="dates@linkedu.test").update(created_on=None, updated_on=None)
+
+        serializer = UserListSerializer()
+        queryset = User.objects.order_by("id")
+        rows = queryset.values(*UserListSerializer.values_fields)
+        for user, row in zip(queryset, rows):
+            with self.subTest(user.email):
+                self.assertEqual(serializer.to_values_representation(row), serializer.to_representation(user))
+
+        full = serializer.to_values_representation(rows[0])
+        # The formats of the original `strftime` calls.
+        self.assertEqual(full["created_on"], "05 Jan, 2024, 07:08:09")
+        self.assertEqual(full["dob"], full["created_on"])
+        self.assertEqual(full["updated_on"], "31 Dec, 2024 23:59:59")
+        self.assertEqual(
+            UserListSerializer(queryset, many=True).data,
+            UserListSerializer(list(rows), many=True).data,
+        )
+
+
+class UserAutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        # The view and the User signal receivers both use the patched index.
+        self.enterContext(mock.patch("accounts.autocomplete.user_index", self.index))
+        self.enterContext(mock.patch("accounts.api.views.user_index", self.index))
+        self.user = create_user()
+        self.ada = create_user(email="ada@linkedu.test", first_name="Ada", last_name="Lovelace King")
+        self.alan = create_user(email="alan@linkedu.test", first_name="Alan", last_name="Turing")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def autocomplete(self, prefix, **params):
+        response = self.client.get(reverse("accounts:user-autocomplete"), {"q": prefix, **params})
+        return response.status_code, [user["id"] for user in response.data["detail"]]
+
+    def test_prefix_matches_every_word(self):
+        self.assertEqual(self.autocomplete("A"), (200, sorted([self.ada.id, self.alan.id])))
+        self.assertEqual(self.autocomplete("kin"), (200, [self.ada.id]))
+        self.assertEqual(self.autocomplete("lovelace"), (200, [self.ada.id]))
+        self.assertEqual(self.autocomplete("x"), (200, []))
+
+    def test_limit(self):
+        self.assertEqual(len(self.autocomplete("a", limit=1)[1]), 1)
+        self.assertEqual(self.autocomplete("", limit=1), (400, []))
+        self.assertEqual(self.autocomplete("a", limit=0), (400, []))
+
+    def test_user_save_and_delete_update_the_index(self):
+        self.autocomplete("a")
+        self.alan.first_name = "Grace"
+        self.alan.save()
+        self.assertEqual(self.autocomplete("alan")[1], [])
+        self.assertEqual(self.autocomplete("grace")[1], [self.alan.id])
+
+        self.ada.delete()
+        self.assertEqual(self.autocomplete("ada")[1], [])
+
+    def test_failed_build_allows_a_rebuild(self):
+        with mock.patch.object(self.index, "_build", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.index.ensure_fresh()
+        self.assertFalse(self.index._rebuilding)
+        self.assertEqual(self.autocomplete("turing")[1], [self.alan.id])
@@ -3,6 +3,34 @@ email_validator_pattern="^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
 page_size = 10
 page_size_query_param = 'page_size'
 max_page_size = 10
+cursor_query_param = 'cursor'
+cursor_page_size = 20
+cursor_max_page_size = 100
+pagination_query_param = 'pagination'
+count_query_param = 'count'
+count_cache_timeout = 300
+autocomplete_limit = 10
+autocomplete_max_limit = 50
+export_chunk_size = 2000
+export_rate_limit = 2
+export_rate_window = 3600
+PAGE_PAGINATION="page"
+CURSOR_PAGINATION="cursor"
+ESTIMATED_COUNT="estimated"
+CACHED_COUNT="cached"
+friend_request_rate_limit = 3
+friend_request_rate_window = 60
+bulk_friend_request_max = 100
+bulk_transition_max = 500
+mutual_friends_batch_max = 100
+friend_suggestions_k = 20
+connection_max_depth = 6
+friend_graph_overlay_margin = 60
+friend_events_keepalive = 15
+friend_events_stream_seconds = 300
+friend_events_retry = 3000
+SENT="sent"
+FAILED="failed"
 ACCEPTED="accepted"
 PENDING="pending"
-REJECTED="rejected"
\ No newline at end of file
+REJECTED="rejected"
@@ -1,6 +1,11 @@
 #!/bin/sh
 echo "running"
 python manage.py makemigrations --no-input
+python manage.py encode_friend_request_status
+python manage.py report_email_duplicates --normalize
 python manage.py migrate #--no-input
+python manage.py backfill_friendships
+python manage.py reconcile_friend_counts --fix
 python manage.py collectstatic --no-input
+python manage.py build_friend_graph
 gunicorn LinkedU.wsgi:application --bind 0.0.0.0:8000 --reload --timeout 900
@@ -1,7 +1,9 @@
 from rest_framework import serializers
-from friends.models import FriendRequest
-from django.utils import timezone
-from datetime import timedelta
+from django.db import IntegrityError, transaction
+from friends.models import FriendCounts, FriendRequest
+from accounts.models import User
+from ratelimit import RateLimit
+import constants as const
 
 
 class FriendRequestSerializer(serializers.ModelSerializer):
@@ -65,8 +67,17 @@ class SendFrientRequestSerializer(serializers.ModelSerializer):
     This serializer validates and creates FriendRequest instances. It includes validation
     methods to ensure that the request is not sent to oneself, that the request hasn't been
     sent already, and that the user does not exceed the limit of sending three requests per minute.
+    The per-minute limit is tracked by the rate limiter rather than counted in the database; a
+    unit is only taken in `create`, once the request is valid, and handed back if the insert fails.
     """
 
+    rate_limit = RateLimit(
+        "friend-request",
+        limit=const.friend_request_rate_limit,
+        window=const.friend_request_rate_window,
+    )
+    rate_limit_message = "You can only send 3 friend requests per minute."
+
     class Meta:
         model = FriendRequest
         fields = ["to_user"]
@@ -91,35 +102,171 @@ class SendFrientRequestSerializer(serializers.ModelSerializer):
         """
         Validates the attributes of the friend request.
 
-        Checks if the user has already sent a friend request to the target user and ensures that the user does not
-        exceed the limit of sending three requests per minute.
+        Checks if the user has already sent a friend request to the target user. The per-minute
+        limit is checked by `create`, so that invalid requests don't use up the budget.
         """
         from_user = self.context["request"].user
         to_user = attrs.get("to_user")
 
-        now = timezone.now()
-        one_minute_ago = now - timedelta(minutes=1)
-
         # Check if the user has already sent a friend request to the target user
         if FriendRequest.objects.filter(from_user=from_user, to_user=to_user).exists():
             raise serializers.ValidationError("Friend request already sent.")
+        return attrs
 
-        # # Check the number of requests sent in the last minute
-        recent_requests_count = FriendRequest.objects.filter(
-            from_user=from_user, created_at__gte=one_minute_ago
-        ).count()
+    def create(self, validated_data):
+        """
+        Creates a FriendRequest instance with the validated data, within the per-minute limit.
+        """
+        from_user = self.context["request"].user
+        # Take one unit of the per-minute budget; the limiter is atomic across requests.
+        if not self.rate_limit.allow(from_user.pk):
+            raise serializers.ValidationError({"non_field_errors": [self.rate_limit_message]})
+        try:
+            with transaction.atomic():
+                friend_request = FriendRequest.objects.create(
+                    from_user=from_user, to_user=validated_data["to_user"], status="pending"
+                )
+                FriendCounts.objects.record_sent([(from_user.id, friend_request.to_user_id)])
+        except Exception as e:
+            # Nothing was sent, hand the unit back.
+            self.rate_limit.release(from_user.pk)
+            if isinstance(e, IntegrityError):
+                # Sent concurrently since `validate` checked it.
+                raise serializers.ValidationError({"non_field_errors": ["Friend request already sent."]})
+            raise
+        return friend_request
 
-        if recent_requests_count >= 3:
-            raise serializers.ValidationError(
-                "You can only send 3 friend requests per minute."
-            )
-        return attrs
+
+class BulkSendFriendRequestSerializer(serializers.Serializer):
+    """
+    Serializer for sending friend requests to many users at once.
+
+    The same rules as `SendFrientRequestSerializer` apply to every target user, but they are
+    checked with set-based queries: one query for the existing users, one for the requests
+    already sent, and a single reservation on the shared rate limit budget. The accepted
+    targets are inserted with one `bulk_create`, which is retried without the targets sent
+    concurrently in the meantime. `save()` returns a result per target.
+    """
+
+    to_users = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=const.bulk_friend_request_max,
+    )
 
     def create(self, validated_data):
         """
-        Creates a FriendRequest instance with the validated data.
+        Validates the targets as a set, inserts the valid ones and returns per-item results.
         """
+
         from_user = self.context["request"].user
-        return FriendRequest.objects.create(
-            from_user=from_user, to_user=validated_data["to_user"], status="pending"
+        # Duplicate targets are only sent once.
+        to_user_ids = list(dict.fromkeys(validated_data["to_users"]))
+
+        existing_users = set(
+            User.objects.filter(id__in=to_user_ids).values_list("id", flat=True)
+        )
+        already_sent = set(
+            FriendRequest.objects.filter(
+                from_user=from_user, to_user__in=to_user_ids
+            ).values_list("to_user_id", flat=True)
         )
+
+        results, candidates = {}, []
+        for to_user_id in to_user_ids:
+            if to_user_id not in existing_users:
+                message = f'Invalid pk "{to_user_id}" - object does not exist.'
+            elif to_user_id == from_user.id:
+                message = "You cannot send a friend request to yourself."
+            elif to_user_id in already_sent:
+                message = "Friend request already sent."
+            else:
+                candidates.append(to_user_id)
+                continue
+            results[to_user_id] = {"status": const.FAILED, "message": message}
+
+        granted = SendFrientRequestSerializer.rate_limit.acquire(from_user.pk, len(candidates))
+        for to_user_id in candidates[granted:]:
+            results[to_user_id] = {
+                "status": const.FAILED,
+                "message": SendFrientRequestSerializer.rate_limit_message,
+            }
+
+        sent = candidates[:granted]
+        with transaction.atomic():
+            while sent:
+                try:
+                    # Not `ignore_conflicts`: the rows skipped would still be counted and reported.
+                    with transaction.atomic():
+                        FriendRequest.objects.bulk_create(
+                            FriendRequest(from_user=from_user, to_user_id=to_user_id, status=const.PENDING)
+                            for to_user_id in sent
+                        )
+                    break
+                except IntegrityError:
+                    # Some were sent concurrently since `already_sent` was read; retry without them.
+                    raced = set(
+                        FriendRequest.objects.filter(
+                            from_user=from_user, to_user__in=sent
+                        ).values_list("to_user_id", flat=True)
+                    )
+                    if not raced:
+                        SendFrientRequestSerializer.rate_limit.release(from_user.pk, len(sent))
+                        raise
+                    for to_user_id in raced:
+                        results[to_user_id] = {
+                            "status": const.FAILED,
+                            "message": "Friend request already sent.",
+                        }
+                    sent = [to_user_id for to_user_id in sent if to_user_id not in raced]
+                    SendFrientRequestSerializer.rate_limit.release(from_user.pk, len(raced))
+            FriendCounts.objects.record_sent([(from_user.id, to_user_id) for to_user_id in sent])
+        for to_user_id in sent:
+            results[to_user_id] = {
+                "status": const.SENT,
+                "message": "Friend request sent successfully.",
+            }
+
+        return [
+            {"to_user": to_user_id, **results[to_user_id]} for to_user_id in to_user_ids
+        ]
+
+
+class BulkFriendRequestTransitionSerializer(serializers.Serializer):
+    """
+    Serializer for accepting or rejecting many friend requests at once.
+
+    Either `request_ids` (the ids of the users who sent the requests, like the single
+    accept/reject endpoints) or `all=true` for every pending request must be given.
+    """
+
+    request_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=const.bulk_transition_max,
+    )
+    all = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        """
+        Ensures that exactly one of `request_ids` and `all` is used.
+        """
+
+        if attrs["all"] == ("request_ids" in attrs):
+            raise serializers.ValidationError(
+                "Provide either request_ids or all, but not both."
+            )
+        return attrs
+
+
+class MutualFriendCountsSerializer(serializers.Serializer):
+    """
+    Serializer for the batched mutual friend counts, `?user_ids=1&user_ids=2...`.
+    """
+
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=const.mutual_friends_batch_max,
+    )
@@ -1,16 +1,30 @@
 from django.urls import path
 from friends.api.views import (
     SendFriendRequest,
+    BulkSendFriendRequest,
     AcceptFriendRequestView,
     ListFriendRequestsView,
     RejectFriendRequestView,
+    BulkAcceptFriendRequestView,
+    BulkRejectFriendRequestView,
     ListFriendsAcceptedRequest,
+    MutualFriendsView,
+    MutualFriendCountsView,
+    FriendSuggestionsView,
+    ConnectionView,
+    FriendCountsView,
+    FriendEventsView,
 )
 
 app_name = "friends"
 
 urlpatterns = [
     path("send-request/api/v1", SendFriendRequest.as_view(), name="friend-request"),
+    path(
+        "bulk-send-request/api/v1",
+        BulkSendFriendRequest.as_view(),
+        name="bulk-friend-request",
+    ),
     path(
         "accept-request/api/v1",
         AcceptFriendRequestView.as_view(),
@@ -21,6 +35,16 @@ urlpatterns = [
         RejectFriendRequestView.as_view(),
         name="reject-request",
     ),
+    path(
+        "bulk-accept-request/api/v1",
+        BulkAcceptFriendRequestView.as_view(),
+        name="bulk-accept-request",
+    ),
+    path(
+        "bulk-reject-request/api/v1",
+        BulkRejectFriendRequestView.as_view(),
+        name="bulk-reject-request",
+    ),
     path(
         "friend-requests/api/v1",
         ListFriendRequestsView.as_view(),
@@ -31,4 +55,34 @@ urlpatterns = [
         ListFriendsAcceptedRequest.as_view(),
         name="list-friends-accepted-request",
     ),
+    path(
+        "mutual-friends/<int:user_id>/api/v1",
+        MutualFriendsView.as_view(),
+        name="mutual-friends",
+    ),
+    path(
+        "mutual-friends/counts/api/v1",
+        MutualFriendCountsView.as_view(),
+        name="mutual-friend-counts",
+    ),
+    path(
+        "suggestions/api/v1",
+        FriendSuggestionsView.as_view(),
+        name="friend-suggestions",
+    ),
+    path(
+        "connection/<int:user_id>/api/v1",
+        ConnectionView.as_view(),
+        name="connection",
+    ),
+    path(
+        "counts/api/v1",
+        FriendCountsView.as_view(),
+        name="friend-counts",
+    ),
+    path(
+        "events/api/v1",
+        FriendEventsView.as_view(),
+        name="friend-events",
+    ),
 ]
@@ -1,17 +1,34 @@
-from django.db.models import Q
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.db.models import F, Q, Exists, OuterRef
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from utils import st
+from utils import st, KeysetPagination
+from renderers import ORJSONRenderer
+from friends.cache import friend_cache, FriendCacheMixin
+from friends.graph import friend_graph
+from friends import events
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from accounts.authentication import CachedJWTAuthentication
 from accounts.models import User
-from friends.models import FriendRequest
-from friends.api.serializers import FriendRequestSerializer, SendFrientRequestSerializer
-from rest_framework.exceptions import ValidationError
+from friends.models import FriendCounts, FriendRequest, Friendship, FriendSuggestion
+from friends.api.serializers import (
+    FriendRequestSerializer,
+    SendFrientRequestSerializer,
+    BulkSendFriendRequestSerializer,
+    BulkFriendRequestTransitionSerializer,
+    MutualFriendCountsSerializer,
+)
+from rest_framework.exceptions import AuthenticationFailed, ValidationError, NotFound
 import constants as const
 from accounts.api.serializer import UserListSerializer
 
+logger = logging.getLogger(__name__)
+
 
 class SendFriendRequest(APIView):
     """
@@ -22,7 +39,8 @@ class SendFriendRequest(APIView):
     or failure of the request. 
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 8
 
     def post(self, request, *args, **kwargs):
 
@@ -31,7 +49,9 @@ class SendFriendRequest(APIView):
                 data=request.data, context={"request": request}
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            friend_request = serializer.save()
+            friend_cache.bump_on_commit(friend_request.from_user_id, friend_request.to_user_id)
+            events.publish_sent(friend_request.from_user_id, [friend_request.to_user_id])
 
             payload = st.get_payload(
                 detail=serializer.data,
@@ -67,16 +87,66 @@ class SendFriendRequest(APIView):
             return Response(data=payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class BulkSendFriendRequest(APIView):
+    """
+    View to handle sending friend requests to many users in one call.
+
+    This view handles POST requests with a list of `to_users` ids. The whole batch is validated
+    with set-based queries and inserted at once by `BulkSendFriendRequestSerializer`, and the
+    response lists the outcome for every target user.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 10
+
+    def post(self, request, *args, **kwargs):
+
+        try:
+            serializer = BulkSendFriendRequestSerializer(
+                data=request.data, context={"request": request}
+            )
+            serializer.is_valid(raise_exception=True)
+            results = serializer.save()
+            sent = [result["to_user"] for result in results if result["status"] == const.SENT]
+            friend_cache.bump_on_commit(request.user.pk, *sent)
+            events.publish_sent(request.user.pk, sent)
+
+            payload = st.get_payload(
+                detail=results,
+                message="Friend requests processed.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(payload, status=status.HTTP_200_OK)
+
+        except ValidationError as e:
+            payload = st.get_payload(
+                detail=e.detail,
+                message="Invalid request.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            logger.exception("Bulk friend request failed")
+            payload = st.get_payload(
+                detail={},
+                message="An un-expected error Occurse.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(data=payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class AcceptFriendRequestView(APIView):
     """
     View to handle accepting a friend request.
 
-    This view handles POST requests to accept a friend request. It checks the provided request ID,
-    verifies the status of the friend request, and updates its status to 'accepted' if valid. 
+    This view handles POST requests to accept a friend request. It checks the provided request ID
+    and moves the friend request to 'accepted' with a single atomic transition if its status allows it.
     The view returns appropriate responses based on the success or failure of the request.
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 9
 
     def post(self, request):
         request_id = request.data.get("request_id")
@@ -89,10 +159,18 @@ class AcceptFriendRequestView(APIView):
             return Response(data=payload, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            friend_request = FriendRequest.objects.get(
+            friend_requests = FriendRequest.objects.filter(
                 from_user=request_id, to_user=request.user
             )
-            if friend_request.status == const.ACCEPTED:
+            transitions = friend_requests.transition(const.ACCEPTED)
+
+            friend_cache.bump_on_commit(request.user.pk, *[t.from_user_id for t in transitions])
+            events.publish_transitions(transitions, const.ACCEPTED)
+
+            if not transitions:
+                # Nothing changed: the request either doesn't exist or is accepted already.
+                if not friend_requests.exists():
+                    raise FriendRequest.DoesNotExist
                 payload = st.get_payload(
                     detail={},
                     message="Friend request already accepted.",
@@ -100,9 +178,6 @@ class AcceptFriendRequestView(APIView):
                 )
                 return Response(payload, status=status.HTTP_400_BAD_REQUEST)
 
-            friend_request.status = const.ACCEPTED
-            friend_request.save()
-
             payload = st.get_payload(
                 detail={},
                 message="Friend request accepted.",
@@ -140,12 +215,13 @@ class RejectFriendRequestView(APIView):
     """
     View to handle rejecting a friend request.
 
-    This view handles POST requests to reject a friend request. It validates the provided request ID,
-    checks the status of the friend request, and updates its status to 'rejected' if valid. 
+    This view handles POST requests to reject a friend request. It validates the provided request ID
+    and moves the friend request to 'rejected' with a single atomic transition if its status allows it.
     The view returns appropriate responses based on the success or failure of the request.
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 9
 
     def post(self, request):
         request_id = request.data.get("request_id")
@@ -158,19 +234,24 @@ class RejectFriendRequestView(APIView):
             return Response(data=payload, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            friend_request = FriendRequest.objects.get(
+            friend_requests = FriendRequest.objects.filter(
                 from_user=request_id, to_user=request.user
             )
-            if friend_request.status == const.REJECTED:
+            transitions = friend_requests.transition(const.REJECTED)
+
+            friend_cache.bump_on_commit(request.user.pk, *[t.from_user_id for t in transitions])
+            events.publish_transitions(transitions, const.REJECTED)
 
+            if not transitions:
+                # Nothing changed: the request either doesn't exist or is rejected already.
+                if not friend_requests.exists():
+                    raise FriendRequest.DoesNotExist
                 payload = st.get_payload(
                     detail={},
                     message="Friend request already rejected.",
                     is_authenticated=st.is_authenticated_status(request),
                 )
                 return Response(payload, status=status.HTTP_400_BAD_REQUEST)
-            friend_request.status = const.REJECTED
-            friend_request.save()
 
             payload = st.get_payload(
                 detail={},
@@ -205,35 +286,167 @@ class RejectFriendRequestView(APIView):
             return Response(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class ListFriendRequestsView(APIView):
+class BulkFriendRequestTransitionView(APIView):
+    """
+    Base view to accept or reject many friend requests in one call.
+
+    This view handles POST requests with either a list of `request_ids` or `all=true` for every
+    pending request. The transition is applied to all of them with a single UPDATE inside one
+    transaction, together with the Friendship rows, and the response lists the outcome per id.
+    Subclasses set the target status and the messages.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 10
+    transition_status = None
+    success_message = None
+    unchanged_message = None
+
+    def post(self, request):
+        try:
+            serializer = BulkFriendRequestTransitionSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+
+            friend_requests = FriendRequest.objects.filter(to_user=request.user)
+            request_ids = serializer.validated_data.get("request_ids")
+            if request_ids is None:
+                friend_requests = friend_requests.filter(status=const.PENDING)
+            else:
+                request_ids = list(dict.fromkeys(request_ids))
+                friend_requests = friend_requests.filter(from_user__in=request_ids)
+
+            transitions = friend_requests.transition(self.transition_status)
+            friend_cache.bump_on_commit(request.user.pk, *[t.from_user_id for t in transitions])
+            events.publish_transitions(transitions, self.transition_status)
+
+            payload = st.get_payload(
+                detail=self.get_results(request, request_ids, transitions),
+                message=f"{len(transitions)} friend requests {self.transition_status}.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(payload, status=status.HTTP_200_OK)
+
+        except ValidationError as e:
+            payload = st.get_payload(
+                detail=e.detail,
+                message="Invalid request.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            logger.exception("Bulk friend request %s failed", self.transition_status)
+            payload = st.get_payload(
+                detail={},
+                message="An unexpected error occurred.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def get_results(self, request, request_ids, transitions):
+        """
+        Returns the outcome of every requested id; unchanged ids cost one extra query.
+        """
+
+        changed = {friend_request.from_user_id for friend_request in transitions}
+        if request_ids is None:
+            request_ids = [friend_request.from_user_id for friend_request in transitions]
+
+        unchanged = [request_id for request_id in request_ids if request_id not in changed]
+        existing = set()
+        if unchanged:
+            existing = set(
+                FriendRequest.objects.filter(
+                    to_user=request.user, from_user__in=unchanged
+                ).values_list("from_user_id", flat=True)
+            )
+
+        results = []
+        for request_id in request_ids:
+            if request_id in changed:
+                result = {"status": self.transition_status, "message": self.success_message}
+            elif request_id in existing:
+                result = {"status": const.FAILED, "message": self.unchanged_message}
+            else:
+                result = {"status": const.FAILED, "message": "Friend request not found."}
+            results.append({"request_id": request_id, **result})
+        return results
+
+
+class BulkAcceptFriendRequestView(BulkFriendRequestTransitionView):
+    """
+    View to accept many friend requests, or every pending one with `all=true`.
+    """
+
+    transition_status = const.ACCEPTED
+    success_message = "Friend request accepted."
+    unchanged_message = "Friend request already accepted."
+
+
+class BulkRejectFriendRequestView(BulkFriendRequestTransitionView):
+    """
+    View to reject many friend requests, or every pending one with `all=true`.
+    """
+
+    transition_status = const.REJECTED
+    success_message = "Friend request rejected."
+    unchanged_message = "Friend request already rejected."
+
+
+class ListFriendRequestsView(FriendCacheMixin, APIView):
     """
     View to handle listing friend requests based on their status.
 
     This view handles GET requests to list friend requests for the authenticated user.
     It filters the requests based on the status provided in the query parameters ('pending', 'accepted', 'rejected').
+    The requests are returned newest first, one keyset page at a time; the cursor of the next page
+    is returned in `extra_information.next_cursor`.
     Returns an appropriate response based on the status of the friend requests.
+    Payloads are cached per user version, and polling clients get `304 Not Modified` while
+    the version is unchanged.
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 2
+
+    # Columns read by FriendRequestSerializer; both users are joined in the same query.
+    fields = (
+        "id",
+        "status",
+        "created_at",
+        "updated_at",
+        "from_user__id",
+        "from_user__email",
+        "to_user__id",
+        "to_user__email",
+    )
+
+    def __init__(self, **kwargs) -> None:
+        self.pagination = KeysetPagination(ordering=("-created_at", "-id"))
+        super().__init__(**kwargs)
 
     def get(self, request):
         try:
+            not_modified = self.get_not_modified_response(request)
+            if not_modified is not None:
+                return not_modified
+
             request_status = request.query_params.get("status")
 
             if request_status == const.PENDING:
                 requests_ = FriendRequest.objects.filter(
                     to_user=request.user, status=const.PENDING
-                )
+                ).select_related("from_user", "to_user").only(*self.fields)
 
             elif request_status == const.ACCEPTED:
                 requests_ = FriendRequest.objects.filter(
                     to_user=request.user, status=const.ACCEPTED
-                )
+                ).select_related("from_user", "to_user").only(*self.fields)
 
             elif request_status == const.REJECTED:
                 requests_ = FriendRequest.objects.filter(
                     to_user=request.user, status=const.REJECTED
-                )
+                ).select_related("from_user", "to_user").only(*self.fields)
             else:
                 payload = st.get_payload(
                     detail=[],
@@ -242,14 +455,28 @@ class ListFriendRequestsView(APIView):
                 )
                 return Response(payload, status=status.HTTP_400_BAD_REQUEST)
 
-            serializer = FriendRequestSerializer(requests_, many=True)
+            cache_key = self.get_cache_key(request)
+            payload = friend_cache.get(cache_key)
+            if payload is None:
+                paginated_requests = self.pagination.paginate_queryset(requests_, request)
+                serializer = FriendRequestSerializer(paginated_requests, many=True)
 
+                payload = st.get_payload(
+                    detail=serializer.data,
+                    message=f"{request_status} friend requests.",
+                    is_authenticated=st.is_authenticated_status(request),
+                    extra_information=self.pagination.get_extra_information(),
+                )
+                friend_cache.set(cache_key, payload)
+            return Response(payload, status=status.HTTP_200_OK)
+
+        except NotFound as e:
             payload = st.get_payload(
-                detail=serializer.data,
-                message=f"{request_status} friend requests.",
+                detail=[],
+                message=f"{e.detail}",
                 is_authenticated=st.is_authenticated_status(request),
             )
-            return Response(payload, status=status.HTTP_200_OK)
+            return Response(payload, status=status.HTTP_404_NOT_FOUND)
 
         except Exception as e:
             print("Error: ", e)
@@ -263,36 +490,327 @@ class ListFriendRequestsView(APIView):
 
 
 
-class ListFriendsAcceptedRequest(APIView):
+class ListFriendsAcceptedRequest(FriendCacheMixin, APIView):
     """
     View to list users who have accepted the current user's friend request.
 
     This view handles GET requests to retrieve users who have accepted the authenticated user's friend request.
-    It queries the database to find users who have a status of 'accepted' in the friend request relationships.
-    Returns the list of users who have accepted the friend request.
+    The friends are read from the materialized Friendship table, which is kept in sync whenever
+    a friend request is accepted, rejected or deleted.
+    The list is paginated with a keyset cursor on the friendship (since, id), newest friends first.
+    Payloads are cached per user version, and polling clients get `304 Not Modified` while
+    the version is unchanged.
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 2
+
+    def __init__(self, **kwargs) -> None:
+        self.pagination = KeysetPagination(ordering=("-friends_since", "-friendship_id"))
+        super().__init__(**kwargs)
 
     def get(self, request):
+        not_modified = self.get_not_modified_response(request)
+        if not_modified is not None:
+            return not_modified
+
         user = request.user
+        cache_key = self.get_cache_key(request)
+        payload = friend_cache.get(cache_key)
+        if payload is not None:
+            return Response(data=payload, status=status.HTTP_200_OK)
 
         # Users who have accepted the current user's friend request
-        accepted_request_user_ = User.objects.filter(
-            Q(sent_requests__to_user=user, sent_requests__status=const.ACCEPTED)
-            | Q(
-                received_requests__from_user=user,
-                received_requests__status=const.ACCEPTED,
+        accepted_request_user_ = (
+            User.objects.filter(friend_of__user=user)
+            .annotate(friends_since=F("friend_of__since"), friendship_id=F("friend_of__id"))
+            .values(*UserListSerializer.values_fields, "friends_since", "friendship_id")
+        )
+
+        try:
+            paginated_user_qs = self.pagination.paginate_queryset(
+                accepted_request_user_, request
+            )
+        except NotFound as e:
+            payload = st.get_payload(
+                detail=[],
+                message=f"{e.detail}",
+                is_authenticated=st.is_authenticated_status(request),
             )
-        ).distinct()
+            return Response(data=payload, status=status.HTTP_404_NOT_FOUND)
 
         serialized_accepted_request_user = UserListSerializer(
-            accepted_request_user_, many=True
+            paginated_user_qs, many=True
         ).data
 
         payload = st.get_payload(
             detail=serialized_accepted_request_user,
             message="Users who have accepted the current user's friend request.",
             is_authenticated=st.is_authenticated_status(request),
+            extra_information=self.pagination.get_extra_information(),
         )
+        friend_cache.set(cache_key, payload)
         return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class MutualFriendsView(APIView):
+    """
+    View to list the mutual friends of the current user and another user.
+
+    The mutual friends are the intersection of both users' Friendship edges, computed by the
+    database in one query and paginated with a keyset cursor on the user id. The number of
+    mutual friends is returned in `extra_information.count`, served from `friend_cache`.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 3
+
+    def __init__(self, **kwargs) -> None:
+        self.pagination = KeysetPagination(ordering=("-id",))
+        super().__init__(**kwargs)
+
+    def get(self, request, user_id):
+        if user_id == request.user.pk:
+            payload = st.get_payload(
+                detail=[],
+                message="Mutual friends need another user.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(data=payload, status=status.HTTP_400_BAD_REQUEST)
+
+        mutual_friends = Friendship.objects.mutual_friends(request.user.pk, user_id).values(
+            *UserListSerializer.values_fields
+        )
+        try:
+            paginated_user_qs = self.pagination.paginate_queryset(mutual_friends, request)
+        except NotFound as e:
+            payload = st.get_payload(
+                detail=[],
+                message=f"{e.detail}",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(data=payload, status=status.HTTP_404_NOT_FOUND)
+
+        counts = friend_cache.get_mutual_counts(
+            request.user.pk,
+            [user_id],
+            lambda other_ids: Friendship.objects.mutual_counts(request.user.pk, other_ids),
+        )
+        payload = st.get_payload(
+            detail=UserListSerializer(paginated_user_qs, many=True).data,
+            message="Mutual friends.",
+            is_authenticated=st.is_authenticated_status(request),
+            extra_information={
+                **self.pagination.get_extra_information(),
+                "count": counts[user_id],
+            },
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class MutualFriendCountsView(APIView):
+    """
+    View to count the mutual friends with up to 100 users in one call.
+
+    Meant for user cards: a page of `UserListAPIView` needs a single extra request with all
+    of its ids, `?user_ids=1&user_ids=2...`. Counts come from `friend_cache`, and the missing
+    ones are computed together with one grouped intersection query.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 2
+
+    def get(self, request):
+        serializer = MutualFriendCountsSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            payload = st.get_payload(
+                detail=serializer.errors,
+                message="Invalid request.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(data=payload, status=status.HTTP_400_BAD_REQUEST)
+
+        user_ids = list(dict.fromkeys(serializer.validated_data["user_ids"]))
+        counts = friend_cache.get_mutual_counts(
+            request.user.pk,
+            user_ids,
+            lambda other_ids: Friendship.objects.mutual_counts(request.user.pk, other_ids),
+        )
+        payload = st.get_payload(
+            detail=[{"user_id": user_id, "count": counts[user_id]} for user_id in user_ids],
+            message="Mutual friend counts.",
+            is_authenticated=st.is_authenticated_status(request),
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class FriendSuggestionsView(APIView):
+    """
+    View to list the "people you may know" suggestions of the current user.
+
+    The suggestions are precomputed by `compute_friend_suggestions` and ranked by their
+    number of mutual friends. Users the current user has exchanged a friend request with
+    since the last computation are left out.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 2
+
+    def get(self, request):
+        user = request.user
+        requested = FriendRequest.objects.filter(
+            Q(from_user=user, to_user=OuterRef("suggested_id"))
+            | Q(from_user=OuterRef("suggested_id"), to_user=user)
+        )
+        suggestions = (
+            FriendSuggestion.objects.filter(user=user)
+            .exclude(Exists(requested))
+            .order_by("-score", "suggested_id")
+            .values("score", *[f"suggested__{field}" for field in UserListSerializer.values_fields])
+        )[:const.friend_suggestions_k]
+
+        serializer = UserListSerializer()
+        detail = []
+        for suggestion in suggestions:
+            row = {field: suggestion[f"suggested__{field}"] for field in UserListSerializer.values_fields}
+            detail.append(
+                {**serializer.to_values_representation(row), "mutual_friends": suggestion["score"]}
+            )
+
+        payload = st.get_payload(
+            detail=detail,
+            message="People you may know.",
+            is_authenticated=st.is_authenticated_status(request),
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class ConnectionView(APIView):
+    """
+    View to find how the current user is connected to another user.
+
+    The shortest chain of friendships between them is found by a bidirectional BFS over the
+    memory-mapped graph snapshot (see `friends.graph`), with the friendships changed since
+    the snapshot replayed from FriendshipChange. `extra_information.degree` is the number of
+    hops, and `detail` lists the users along the way; no connection within
+    `connection_max_depth` hops is a 404.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    # Authentication, the overlay (or one query per hop before the first snapshot), the users.
+    query_budget = const.connection_max_depth + 2
+
+    def get(self, request, user_id):
+        path = friend_graph.shortest_path(request.user.pk, user_id)
+        if path is None:
+            payload = st.get_payload(
+                detail=[],
+                message=f"No connection within {const.connection_max_depth} degrees.",
+                is_authenticated=st.is_authenticated_status(request),
+            )
+            return Response(data=payload, status=status.HTTP_404_NOT_FOUND)
+
+        users = {
+            user["id"]: user
+            for user in User.objects.filter(id__in=path).values("id", "username", "first_name", "last_name")
+        }
+        payload = st.get_payload(
+            detail=[users[path_user_id] for path_user_id in path if path_user_id in users],
+            message="Connection found.",
+            is_authenticated=st.is_authenticated_status(request),
+            extra_information={"degree": len(path) - 1},
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class FriendCountsView(APIView):
+    """
+    View to return the current user's friend and pending request counts, for the app badge.
+
+    The counts are read from the FriendCounts row maintained by the write paths, one
+    primary key lookup instead of counting friend requests.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    query_budget = 2
+
+    def get(self, request):
+        counts = (
+            FriendCounts.objects.filter(user=request.user).values(*FriendCounts.COUNTERS).first()
+            or dict.fromkeys(FriendCounts.COUNTERS, 0)
+        )
+        payload = st.get_payload(
+            detail=counts,
+            message="Friend counts.",
+            is_authenticated=st.is_authenticated_status(request),
+        )
+        return Response(data=payload, status=status.HTTP_200_OK)
+
+
+class FriendEventsView(View):
+    """
+    Server-sent events stream of the current user's friend request activity.
+
+    Replaces polling the inbox: the client keeps one `text/event-stream` connection open
+    and receives `request_received`, `request_accepted` and `request_rejected` events as
+    the write paths publish them (see `friends.events`). A reconnecting client sends the
+    `Last-Event-ID` header (or `?last_event_id=`) and gets the events it missed; when some
+    are no longer retained it gets a `resync` event and should reload the inbox instead.
+
+    The view is async and waits on the broker without holding a thread, so it is served by
+    the ASGI application. Streams end after `friend_events_stream_seconds`, and the client
+    reconnects with a token that is checked again.
+    """
+
+    async def get(self, request):
+        try:
+            credentials = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            credentials, message = None, f"{e.detail}"
+        else:
+            message = "Authentication credentials were not provided."
+        if credentials is None:
+            payload = st.get_payload(detail={}, message=message, is_authenticated=False)
+            return JsonResponse(payload, status=status.HTTP_401_UNAUTHORIZED)
+
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+        try:
+            last_event_id = int(last_event_id)
+        except (TypeError, ValueError):
+            last_event_id = None
+
+        response = StreamingHttpResponse(
+            self.stream(credentials[0].pk, last_event_id), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Lets nginx pass every event through as soon as it is written.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, user_id, last_event_id):
+        broker = events.get_broker()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + const.friend_events_stream_seconds
+
+        yield f"retry: {const.friend_events_retry}\n\n"
+        if last_event_id is None:
+            last_event_id = await sync_to_async(broker.get_last_id)(user_id)
+
+        while (remaining := deadline - loop.time()) > 0:
+            new_events = await broker.wait(
+                user_id, last_event_id, min(const.friend_events_keepalive, remaining)
+            )
+            if not new_events:
+                # Comment line, keeps proxies from closing an idle connection.
+                yield ": keepalive\n\n"
+                continue
+
+            if new_events[0].id > last_event_id + 1:
+                yield self.format(new_events[0].id - 1, "resync", {})
+            for event in new_events:
+                yield self.format(event.id, event.type, event.data)
+            last_event_id = new_events[-1].id
+
+    @staticmethod
+    def format(event_id, event_type, data):
+        return f"id: {event_id}\nevent: {event_type}\ndata: {ORJSONRenderer.dumps(data).decode()}\n\n"
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class FriendsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'friends'
+
+    def ready(self):
+        from friends.events import check_broker
+
+        checks.register(check_broker)
@@ -0,0 +1,157 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from utils import ConditionalGetMixin
+
+
+class FriendCache:
+    """
+    Versioned cache of the friend list and inbox payloads of every user.
+
+    Each user has a version number in the cache, and payloads are stored under a key made of
+    the user, the version and the request path. The write paths, and the delete signals of
+    friend requests and users, bump the version of every user they touch, which orphans all of their cached payloads at once; orphans expire after
+    `timeout` seconds. Versions start from the clock, so a version evicted from the cache
+    never comes back to a value that old payloads were stored under.
+
+    Hits and misses are counted in the cache itself, so the hit rate covers every worker
+    sharing it (see the `friend_cache_stats` command).
+    """
+
+    prefix = "friends"
+
+    def __init__(self, alias="default", timeout=None):
+        self.alias = alias
+        self.timeout = timeout or getattr(settings, "FRIEND_CACHE_TIMEOUT", 300)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_version_key(self, user_id):
+        return f"{self.prefix}:version:{user_id}"
+
+    def get_version(self, user_id):
+        key = self.get_version_key(user_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, *user_ids):
+        for user_id in set(user_ids):
+            key = self.get_version_key(user_id)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.add(key, time.time_ns(), timeout=None)
+
+    def bump_on_commit(self, *user_ids):
+        """
+        Bump the versions once the current transaction commits, so that a concurrent read
+        can't cache the old rows under the new version.
+        """
+
+        transaction.on_commit(lambda: self.bump(*user_ids))
+
+    def get_key(self, user_id, version, request):
+        path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+        return f"{self.prefix}:payload:{user_id}:{version}:{path}"
+
+    def get_versions(self, user_ids):
+        keys = {user_id: self.get_version_key(user_id) for user_id in user_ids}
+        versions = self.cache.get_many(keys.values())
+        return {
+            user_id: versions[key] if key in versions else self.get_version(user_id)
+            for user_id, key in keys.items()
+        }
+
+    def get(self, key):
+        payload = self.cache.get(key)
+        self.count("hits" if payload is not None else "misses")
+        return payload
+
+    def get_pair_key(self, user_id, other_id, versions):
+        first, second = sorted((user_id, other_id))
+        return f"{self.prefix}:mutual:{first}:{versions[first]}:{second}:{versions[second]}"
+
+    def get_mutual_counts(self, user_id, other_ids, compute):
+        """
+        Mutual friend counts between `user_id` and each of `other_ids`.
+
+        Counts are cached per pair under the versions of both users, since either of them
+        making or losing a friend changes it. The missing ones are computed together by
+        `compute(missing_ids)`, which returns a {user_id: count} dict.
+        """
+
+        versions = self.get_versions([user_id, *other_ids])
+        keys = {other_id: self.get_pair_key(user_id, other_id, versions) for other_id in other_ids}
+        cached = self.cache.get_many(keys.values())
+        counts = {other_id: cached[key] for other_id, key in keys.items() if key in cached}
+
+        missing = [other_id for other_id in other_ids if other_id not in counts]
+        self.count("hits", len(counts))
+        self.count("misses", len(missing))
+        if missing:
+            computed = compute(missing)
+            computed = {other_id: computed.get(other_id, 0) for other_id in missing}
+            self.cache.set_many(
+                {keys[other_id]: count for other_id, count in computed.items()},
+                timeout=self.timeout,
+            )
+            counts.update(computed)
+        return counts
+
+    def set(self, key, payload):
+        self.cache.set(key, payload, timeout=self.timeout)
+
+    def count(self, name, amount=1):
+        if not amount:
+            return
+        key = f"{self.prefix}:stats:{name}"
+        try:
+            self.cache.incr(key, amount)
+        except ValueError:
+            if not self.cache.add(key, amount, timeout=None):
+                self.cache.incr(key, amount)
+
+    def stats(self):
+        keys = {name: f"{self.prefix}:stats:{name}" for name in ("hits", "misses")}
+        values = self.cache.get_many(keys.values())
+        stats = {name: values.get(key, 0) for name, key in keys.items()}
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else None
+        return stats
+
+    def reset_stats(self):
+        self.cache.delete_many([f"{self.prefix}:stats:{name}" for name in ("hits", "misses")])
+
+
+friend_cache = FriendCache()
+
+
+class FriendCacheMixin(ConditionalGetMixin):
+    """
+    List view mixin serving the user's payloads from `friend_cache`.
+
+    The ETag is built from the user's version, so a poll whose data didn't change is
+    answered 304 without touching the database. Profile edits of the listed users don't
+    bump the version; the time slot in the ETag and the payload timeout let them through
+    after at most `friend_cache.timeout` seconds.
+    """
+
+    cache_version = None
+
+    def get_cache_version(self, request):
+        if self.cache_version is None:
+            self.cache_version = friend_cache.get_version(request.user.pk)
+        return self.cache_version
+
+    def get_etag_validators(self, request):
+        return [self.get_cache_version(request), int(time.time() // friend_cache.timeout)]
+
+    def get_cache_key(self, request):
+        return friend_cache.get_key(request.user.pk, self.get_cache_version(request), request)
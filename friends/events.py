@@ -0,0 +1,259 @@
+"""
+Friend request activity events, published by the write paths and streamed to the users
+they concern by `FriendEventsView`.
+
+Every user has their own sequence of event ids. Sequences start from the clock, like the
+`friend_cache` versions, so ids keep growing across broker restarts and evictions and a
+client resuming from an older `Last-Event-ID` can tell that it missed some events.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque, namedtuple
+from functools import lru_cache
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+Event = namedtuple("Event", ["id", "type", "data"])
+
+
+class BaseBroker:
+    """
+    Storage and notification of the recent events of every user.
+
+    A broker keeps the last `history` events of a user. `wait` is called on the event
+    loop of the streaming view; the other methods are called from the request threads.
+    """
+
+    def __init__(self, history=None, ttl=None) -> None:
+        self.history = history or getattr(settings, "FRIEND_EVENTS_HISTORY", 100)
+        self.ttl = ttl or getattr(settings, "FRIEND_EVENTS_TTL", 3600)
+
+    def publish(self, user_id, type, data):
+        """ Append an event for `user_id` and return it. """
+        raise NotImplementedError("Event brokers must implement publish().")
+
+    def get_last_id(self, user_id):
+        """ Id of the user's latest event, starting the sequence if there is none. """
+        raise NotImplementedError("Event brokers must implement get_last_id().")
+
+    def read(self, user_id, after_id):
+        """ The user's retained events with an id above `after_id`, oldest first. """
+        raise NotImplementedError("Event brokers must implement read().")
+
+    async def wait(self, user_id, after_id, timeout):
+        """ Like `read`, but waits up to `timeout` seconds for an event if there is none. """
+        raise NotImplementedError("Event brokers must implement wait().")
+
+
+class MemoryBroker(BaseBroker):
+    """
+    In-process event logs.
+
+    Waiting streams are woken up as soon as an event is published. Events only reach the
+    streams of the same process, so this broker suits tests and single worker setups.
+    """
+
+    def __init__(self, history=None, ttl=None) -> None:
+        super().__init__(history, ttl)
+        self._lock = threading.Lock()
+        self._logs = {}
+        self._last_ids = {}
+        self._waiters = {}
+
+    def publish(self, user_id, type, data):
+        with self._lock:
+            event = Event(self._get_last_id(user_id) + 1, type, data)
+            self._last_ids[user_id] = event.id
+            self._logs.setdefault(user_id, deque(maxlen=self.history)).append(event)
+            waiters = list(self._waiters.get(user_id, ()))
+
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                # The stream's loop is closed, the waiter goes away with it.
+                pass
+        return event
+
+    def get_last_id(self, user_id):
+        with self._lock:
+            return self._get_last_id(user_id)
+
+    def _get_last_id(self, user_id):
+        return self._last_ids.setdefault(user_id, time.time_ns())
+
+    def read(self, user_id, after_id):
+        with self._lock:
+            return [event for event in self._logs.get(user_id, ()) if event.id > after_id]
+
+    async def wait(self, user_id, after_id, timeout):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(user_id, set()).add(waiter)
+        try:
+            events = self.read(user_id, after_id)
+            if not events:
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                events = self.read(user_id, after_id)
+            return events
+        finally:
+            with self._lock:
+                waiters = self._waiters[user_id]
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[user_id]
+
+
+class CacheBroker(BaseBroker):
+    """
+    Event logs on top of Django's cache framework.
+
+    The last id of a user is a counter moved with the atomic `cache.incr`, and every event
+    is stored under its own key for `ttl` seconds, so every worker sharing the cache
+    (memcached, redis) sees every event. Waiting streams check the counter every
+    `poll_interval` seconds, one cache read instead of a database query per poll.
+    """
+
+    prefix = "friend-events"
+
+    def __init__(self, alias="default", history=None, ttl=None, poll_interval=None) -> None:
+        super().__init__(history, ttl)
+        self.alias = alias
+        self.poll_interval = poll_interval or getattr(settings, "FRIEND_EVENTS_POLL_INTERVAL", 1)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def is_process_local(self):
+        """ Whether the cache is private to the process, so other workers never see events. """
+        return isinstance(self.cache, (LocMemCache, DummyCache))
+
+    def get_last_id_key(self, user_id):
+        return f"{self.prefix}:last:{user_id}"
+
+    def get_event_key(self, user_id, event_id):
+        return f"{self.prefix}:event:{user_id}:{event_id}"
+
+    def publish(self, user_id, type, data):
+        key = self.get_last_id_key(user_id)
+        try:
+            event_id = self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            event_id = self.cache.incr(key)
+        self.cache.set(self.get_event_key(user_id, event_id), (type, data), timeout=self.ttl)
+        return Event(event_id, type, data)
+
+    def get_last_id(self, user_id):
+        key = self.get_last_id_key(user_id)
+        last_id = self.cache.get(key)
+        if last_id is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            last_id = self.cache.get(key)
+        return last_id
+
+    def read(self, user_id, after_id, last_id=None):
+        # An id without its event yet is being published; it is picked up on the next read
+        # unless a later event is read first.
+        last_id = self.get_last_id(user_id) if last_id is None else last_id
+        keys = {
+            self.get_event_key(user_id, event_id): event_id
+            for event_id in range(max(after_id, last_id - self.history) + 1, last_id + 1)
+        }
+        stored = self.cache.get_many(keys)
+        return [Event(keys[key], *stored[key]) for key in keys if key in stored]
+
+    async def wait(self, user_id, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            # Not `cache.aget`: its default runs every stream's poll on one shared thread.
+            last_id = await asyncio.to_thread(self.cache.get, self.get_last_id_key(user_id))
+            if last_id is not None and last_id > after_id:
+                events = await asyncio.to_thread(self.read, user_id, after_id, last_id)
+                if events:
+                    return events
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+
+@lru_cache(maxsize=None)
+def get_broker(path=None):
+    """
+    Returns the shared broker instance configured by `settings.FRIEND_EVENTS_BROKER`.
+
+    Without one, a `CacheBroker` is used if the default cache is shared between processes,
+    and a `MemoryBroker` otherwise, so a plain checkout works in a single process.
+    """
+
+    path = path or getattr(settings, "FRIEND_EVENTS_BROKER", None)
+    if path:
+        return import_string(path)()
+    broker = CacheBroker()
+    return MemoryBroker() if broker.is_process_local else broker
+
+
+def check_broker(app_configs, **kwargs):
+    """
+    System check: a CacheBroker configured on a per-process cache drops the events of every
+    other process, e.g. the ones published by the WSGI workers for the ASGI streams.
+    """
+
+    broker = get_broker()
+    if isinstance(broker, CacheBroker) and broker.is_process_local:
+        return [
+            checks.Warning(
+                f"FRIEND_EVENTS_BROKER uses the '{broker.alias}' cache, which is private to the process.",
+                hint=(
+                    "Point CACHE_BACKEND at a shared cache (redis, memcached), or set "
+                    "FRIEND_EVENTS_BROKER='friends.events.MemoryBroker' for a single process."
+                ),
+                id="friends.W001",
+            )
+        ]
+    return []
+
+
+def publish_on_commit(events):
+    """
+    Publish `(user_id, type, data)` events once the current transaction commits, so that
+    clients never hear of a change they can't read yet.
+    """
+
+    if events:
+        transaction.on_commit(lambda: [get_broker().publish(*event) for event in events])
+
+
+def publish_sent(from_user_id, to_user_ids):
+    """ Tell the receivers of new friend requests about them. """
+
+    publish_on_commit([
+        (to_user_id, "request_received", {"from_user": from_user_id, "to_user": to_user_id})
+        for to_user_id in to_user_ids
+    ])
+
+
+def publish_transitions(transitions, status):
+    """ Tell the senders of the `Transition`ed friend requests about the answer. """
+
+    publish_on_commit([
+        (
+            friend_request.from_user_id,
+            f"request_{status}",
+            {"from_user": friend_request.from_user_id, "to_user": friend_request.to_user_id},
+        )
+        for friend_request in transitions
+    ])
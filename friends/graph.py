@@ -0,0 +1,226 @@
+"""
+Memory-mapped snapshot of the friendship graph and the shortest-path search over it.
+
+The snapshot is a single file holding the graph in CSR form: the sorted user ids, the
+offsets of every user's neighbours and the neighbours themselves, as indices into the ids.
+Every worker maps the same file read-only, so the pages are shared between processes and
+nothing is copied. `build_friend_graph --interval` rewrites the file atomically and
+periodically; workers notice the new file and map it on their next query. Friendships made
+or removed after the snapshot was taken are replayed from FriendshipChange on top of it.
+"""
+
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.conf import settings
+from friends.models import Friendship, FriendshipChange
+import constants as const
+
+MAGIC = b"FGRAPH01"
+# magic, snapshot time (unix seconds), number of users, number of neighbour entries
+HEADER = struct.Struct("<8sdqq")
+
+
+def read_created_at(path):
+    """
+    Snapshot time of the file at `path`, or None when there is no snapshot.
+    """
+
+    try:
+        with open(path, "rb") as snapshot:
+            magic, created_at, _, _ = HEADER.unpack(snapshot.read(HEADER.size))
+    except (FileNotFoundError, struct.error):
+        return None
+    return datetime.fromtimestamp(created_at, tz=dt_timezone.utc) if magic == MAGIC else None
+
+
+def write_snapshot(path, ids, offsets, neighbours, created_at):
+    """
+    Write the CSR arrays to `path`, replacing any previous snapshot atomically.
+    """
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as snapshot:
+        snapshot.write(HEADER.pack(MAGIC, created_at.timestamp(), len(ids), len(neighbours)))
+        snapshot.write(np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+        snapshot.write(np.ascontiguousarray(offsets, dtype=np.int64).tobytes())
+        snapshot.write(np.ascontiguousarray(neighbours, dtype=np.int32).tobytes())
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+
+
+class Snapshot:
+    """
+    Read-only view of a snapshot file; the arrays are memory maps.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot:
+            magic, created_at, users, entries = HEADER.unpack(snapshot.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a friend graph snapshot.")
+
+        self.created_at = datetime.fromtimestamp(created_at, tz=dt_timezone.utc)
+        offset = HEADER.size
+        self.ids = np.memmap(path, dtype=np.int64, mode="r", offset=offset, shape=(users,))
+        offset += 8 * users
+        self.offsets = np.memmap(path, dtype=np.int64, mode="r", offset=offset, shape=(users + 1,))
+        offset += 8 * (users + 1)
+        self.neighbours = (
+            np.memmap(path, dtype=np.int32, mode="r", offset=offset, shape=(entries,))
+            if entries else np.empty(0, dtype=np.int32)
+        )
+
+    def get_neighbours(self, user_id):
+        index = int(np.searchsorted(self.ids, user_id))
+        if index == len(self.ids) or self.ids[index] != user_id:
+            return set()
+        low, high = self.offsets[index], self.offsets[index + 1]
+        return set(self.ids[self.neighbours[low:high]].tolist())
+
+
+class Overlay:
+    """
+    Friendships made and removed since `since`, replayed in order from FriendshipChange.
+
+    The log is read from `friend_graph_overlay_margin` seconds before the snapshot time,
+    which also covers changes that were committed while the snapshot was being read;
+    replaying a change the snapshot already holds leaves the edge as it is.
+    """
+
+    def __init__(self, since):
+        self.added, self.removed = {}, {}
+        changes = (
+            FriendshipChange.objects.filter(
+                changed_at__gte=since - timedelta(seconds=const.friend_graph_overlay_margin)
+            )
+            .order_by("changed_at", "id")
+            .values_list("user_id", "friend_id", "connected")
+        )
+        for user_id, friend_id, connected in changes:
+            for first, second in ((user_id, friend_id), (friend_id, user_id)):
+                added, removed = self.added.setdefault(first, set()), self.removed.setdefault(first, set())
+                if connected:
+                    added.add(second)
+                    removed.discard(second)
+                else:
+                    removed.add(second)
+                    added.discard(second)
+
+
+class FriendGraph:
+    """
+    Per-process handle on the snapshot at `settings.FRIEND_GRAPH_SNAPSHOT`.
+
+    The file is checked for a newer version at most every `FRIEND_GRAPH_CHECK_INTERVAL`
+    seconds. Without a snapshot, the search reads the Friendship table instead.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.FRIEND_GRAPH_SNAPSHOT
+        self.check_interval = getattr(settings, "FRIEND_GRAPH_CHECK_INTERVAL", 5)
+        self._snapshot = None
+        self._signature = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get_snapshot(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._snapshot, self._signature = None, None
+                return None
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if signature != self._signature:
+                self._snapshot, self._signature = Snapshot(self.path), signature
+            return self._snapshot
+
+    def shortest_path(self, source, target, max_depth=const.connection_max_depth):
+        """
+        User ids of a shortest friendship path from `source` to `target`, both included, or
+        None when they are more than `max_depth` hops apart.
+
+        The search is a bidirectional BFS that always expands the smaller frontier, so it
+        visits about two balls of half the distance instead of one of the full distance.
+        """
+
+        if source == target:
+            return [source]
+
+        get_neighbours = self.get_neighbour_reader()
+        parents = ({source: None}, {target: None})
+        frontiers = ([source], [target])
+        for _ in range(max_depth):
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = parents[side], parents[1 - side]
+            next_frontier = []
+            for user_id, neighbours in get_neighbours(frontiers[side]).items():
+                for neighbour in neighbours:
+                    if neighbour in seen:
+                        continue
+                    seen[neighbour] = user_id
+                    if neighbour in other:
+                        return self.join(parents, neighbour)
+                    next_frontier.append(neighbour)
+            if not next_frontier:
+                return None
+            frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+        return None
+
+    def get_neighbour_reader(self):
+        """
+        A function returning the {user_id: friend ids} of a frontier of users.
+
+        With a snapshot, the friends come from the memory map and the overlay, read once per
+        search. Until the first snapshot is built, every BFS level reads the Friendship table
+        with one indexed query, so a search costs at most `max_depth` queries.
+        """
+
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            def get_neighbours(user_ids):
+                neighbours = {user_id: [] for user_id in user_ids}
+                for user_id, friend_id in Friendship.objects.filter(user__in=user_ids).values_list(
+                    "user_id", "friend_id"
+                ):
+                    neighbours[user_id].append(friend_id)
+                return neighbours
+            return get_neighbours
+
+        overlay = Overlay(snapshot.created_at)
+
+        def get_neighbours(user_ids):
+            neighbours = {}
+            for user_id in user_ids:
+                friends = snapshot.get_neighbours(user_id)
+                friends -= overlay.removed.get(user_id, set())
+                friends |= overlay.added.get(user_id, set())
+                neighbours[user_id] = friends
+            return neighbours
+        return get_neighbours
+
+    @staticmethod
+    def join(parents, meeting):
+        forward, backward = [], []
+        user_id = meeting
+        while user_id is not None:
+            forward.append(user_id)
+            user_id = parents[0][user_id]
+        user_id = parents[1][meeting]
+        while user_id is not None:
+            backward.append(user_id)
+            user_id = parents[1][user_id]
+        return forward[::-1] + backward
+
+
+friend_graph = FriendGraph()
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from friends.models import FriendRequest, Friendship
+import constants as const
+
+
+class Command(BaseCommand):
+    """
+    Build the Friendship table from the existing accepted friend requests.
+
+    The accepted requests are streamed in primary key order and written in batches with
+    `bulk_create(ignore_conflicts=True)`, so the command can be re-run safely at any time.
+    The request creation time is used as the friendship start time.
+    """
+
+    help = "Backfill the Friendship table from accepted friend requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of accepted friend requests written per batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        accepted_requests = (
+            FriendRequest.objects.filter(status=const.ACCEPTED)
+            .order_by("id")
+            .values_list("from_user_id", "to_user_id", "created_at")
+        )
+
+        batch, total = [], 0
+        for from_user_id, to_user_id, created_at in accepted_requests.iterator(
+            chunk_size=batch_size
+        ):
+            batch.append(Friendship(user_id=from_user_id, friend_id=to_user_id, since=created_at))
+            batch.append(Friendship(user_id=to_user_id, friend_id=from_user_id, since=created_at))
+            if len(batch) >= 2 * batch_size:
+                total += self.write(batch)
+                batch = []
+
+        if batch:
+            total += self.write(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled friendships for {total} accepted requests.")
+        )
+
+    def write(self, batch):
+        with transaction.atomic():
+            Friendship.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch) // 2
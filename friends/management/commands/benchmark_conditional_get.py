@@ -0,0 +1,102 @@
+import io
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from friends.models import FriendRequest, Friendship
+
+
+class Command(BaseCommand):
+    """
+    Poll the list endpoints with and without `If-None-Match` and compare the cost.
+
+    A user with `--rows` pending requests and friends is seeded, and deleted afterwards. The
+    polls are plain WSGI calls to the project's application. Every endpoint is polled
+    `--polls` times sending the ETag of the first response, then as many times without it,
+    and the CPU time and response bytes per poll are reported for both.
+    """
+
+    help = "Benchmark CPU time and bytes of polling the list endpoints with conditional GET."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="Requests, friends and users seeded.")
+        parser.add_argument("--polls", type=int, default=200, help="Polls per endpoint and mode.")
+
+    def handle(self, *args, **options):
+        self.application = get_wsgi_application()
+        token = self.seed(options["rows"])
+        try:
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+            endpoints = [
+                ("pending requests", reverse("friends:list-friend-request") + "?status=pending"),
+                ("friends list", reverse("friends:list-friends-accepted-request")),
+                ("user list", reverse("accounts:user-list")),
+            ]
+            for name, url in endpoints:
+                etag = self.get(url, headers)[1]["ETag"]
+                full = self.poll(url, options["polls"], headers)
+                conditional = self.poll(url, options["polls"], {**headers, "HTTP_IF_NONE_MATCH": etag})
+                if conditional["statuses"] != {304}:
+                    raise CommandError(f"{name} answered {conditional['statuses']} to its own ETag.")
+                self.stdout.write(
+                    f"{name}: {full['cpu'] * 1000:.2f} -> {conditional['cpu'] * 1000:.2f} ms CPU "
+                    f"and {full['bytes']:,.0f} -> {conditional['bytes']:,.0f} bytes per poll"
+                )
+        finally:
+            User.objects.filter(email__startswith="conditional", email__endswith="@benchmark.check").delete()
+
+    def seed(self, rows):
+        user = User.objects.create_user(
+            email="conditional-get@benchmark.check", password="!", username="poller"
+        )
+        users = User.objects.bulk_create(
+            User(email=f"conditional-{index}@benchmark.check", username=f"poll{index}", password="!")
+            for index in range(2 * rows)
+        )
+        senders, friends = users[:rows], users[rows:]
+        FriendRequest.objects.bulk_create(FriendRequest(from_user=sender, to_user=user) for sender in senders)
+        Friendship.objects.connect_many([(user.id, friend.id) for friend in friends])
+        return str(RefreshToken.for_user(user).access_token)
+
+    def get(self, url, headers):
+        """
+        Call the WSGI application like a server would, and return the status, headers and body.
+        """
+
+        path, _, query = url.partition("?")
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+            **headers,
+        }
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started["status"] = int(status.split()[0])
+            started["headers"] = dict(response_headers)
+
+        response = self.application(environ, start_response)
+        try:
+            body = b"".join(response)
+        finally:
+            response.close()
+        return started["status"], started["headers"], body
+
+    def poll(self, url, polls, headers):
+        statuses, size = set(), 0
+        started = time.process_time()
+        for _ in range(polls):
+            status_code, _, body = self.get(url, headers)
+            statuses.add(status_code)
+            size += len(body)
+        return {"cpu": (time.process_time() - started) / polls, "bytes": size / polls, "statuses": statuses}
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from accounts.models import User
+from friends.models import Friendship, FriendshipChange, FriendSuggestionRun
+from friends import graph, suggestions
+import constants as const
+
+
+class Command(BaseCommand):
+    """
+    Write the CSR snapshot of the Friendship graph used by the connection endpoint.
+
+    With `--interval` the snapshot is rebuilt forever, every that many seconds; this is what
+    the graph service of docker-compose.yml runs. The file is replaced atomically and the
+    workers map the new one within `FRIEND_GRAPH_CHECK_INTERVAL` seconds. Friendships changed
+    in between are replayed from FriendshipChange, whose rows older than the previous snapshot
+    are pruned after every build, unless the next `compute_friend_suggestions` run still needs them.
+    """
+
+    help = "Write the memory-mapped friendship graph snapshot, once or periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default=settings.FRIEND_GRAPH_SNAPSHOT, help="Snapshot file to write."
+        )
+        parser.add_argument(
+            "--interval", type=int, default=0, help="Rebuild every this many seconds; 0 builds once."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.build(options["path"])
+            if not options["interval"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
+
+    def build(self, path):
+        previous_created_at = graph.read_created_at(path)
+        # Taken before reading, so that edges accepted while reading are also in the overlay.
+        created_at = timezone.now()
+        clock = time.perf_counter()
+        ids = suggestions.read_ids(User.objects.order_by("id").values_list("id", flat=True).iterator())
+        # One row per friendship is enough, `to_matrix` adds the other direction.
+        edges = Friendship.objects.filter(user_id__lt=F("friend_id")).values_list("user_id", "friend_id")
+        adjacency = suggestions.to_matrix(ids, *suggestions.read_edges(edges.iterator(chunk_size=10000)))
+        adjacency.sort_indices()
+        graph.write_snapshot(path, ids, adjacency.indptr, adjacency.indices, created_at)
+
+        # Workers may still use the previous snapshot until they notice this one.
+        pruned = 0
+        if previous_created_at is not None:
+            prune_before = previous_created_at - timedelta(seconds=const.friend_graph_overlay_margin)
+            # The incremental suggestion runs read the changes since the last finished run.
+            suggestion_run = (
+                FriendSuggestionRun.objects.filter(finished_at__isnull=False).order_by("-started_at").first()
+            )
+            if suggestion_run is not None:
+                prune_before = min(prune_before, suggestion_run.started_at)
+            pruned, _ = FriendshipChange.objects.filter(changed_at__lt=prune_before).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(ids)} users and {adjacency.nnz // 2} friendships to {path} "
+            f"in {time.perf_counter() - clock:.2f}s, pruned {pruned} friendship changes."
+        ))
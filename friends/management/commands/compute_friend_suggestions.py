@@ -0,0 +1,229 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from accounts.models import User
+from friends.models import FriendRequest, FriendSuggestion, FriendSuggestionRun, Friendship, FriendshipChange
+from friends import suggestions
+import constants as const
+
+
+class Command(BaseCommand):
+    """
+    Compute the "people you may know" suggestions of every user from the friendship graph.
+
+    The friendships are streamed into a sparse adjacency matrix A, and the rows of A² are
+    computed in chunks to rank friends of friends by their number of mutual friends (see
+    `friends.suggestions`). Friends, pending and rejected pairs are never suggested. The top
+    `--k` of every user are stored in FriendSuggestion; a full run replaces them all in one
+    transaction, so the endpoint serves the previous suggestions until it commits.
+
+    After a first full run, runs are incremental: only the users whose edges changed since
+    the previous run, and their friends, are recomputed, and only the friendships within two
+    hops of them are read. `--synthetic-edges` skips the database and reports the throughput
+    on a random graph instead.
+    """
+
+    help = "Compute friend suggestions from friend-of-friend counts (A² of the friendship graph)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=const.friend_suggestions_k, help="Suggestions kept per user.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows of A² computed at once.")
+        parser.add_argument("--full", action="store_true", help="Recompute every user.")
+        parser.add_argument("--synthetic-users", type=int, default=1_000_000, help="Users of the synthetic graph.")
+        parser.add_argument(
+            "--synthetic-edges",
+            type=int,
+            default=0,
+            help="Benchmark on a random graph with this many edges instead of the database.",
+        )
+
+    def handle(self, *args, **options):
+        if options["synthetic_edges"]:
+            return self.benchmark(options)
+
+        started_at = timezone.now()
+        previous = (
+            FriendSuggestionRun.objects.filter(finished_at__isnull=False).order_by("-started_at").first()
+        )
+        incremental = previous is not None and not options["full"]
+        run = FriendSuggestionRun.objects.create(started_at=started_at, incremental=incremental)
+
+        clock = time.perf_counter()
+        ids = suggestions.read_ids(User.objects.order_by("id").values_list("id", flat=True).iterator())
+        if incremental:
+            changed = self.get_changed_users(previous.started_at)
+            adjacency = suggestions.to_matrix(ids, *suggestions.read_edges(self.read_neighbourhood(changed)))
+            rows = suggestions.neighbourhood(adjacency, self.get_rows(ids, changed))
+            declined = self.read_declined(ids[rows])
+        else:
+            # One row per friendship is enough, `to_matrix` adds the other direction.
+            friendships = Friendship.objects.filter(user_id__lt=F("friend_id")).values_list("user_id", "friend_id")
+            adjacency = suggestions.to_matrix(ids, *suggestions.read_edges(friendships.iterator(chunk_size=10000)))
+            rows = np.arange(len(ids))
+            declined = FriendRequest.objects.filter(
+                status__in=[const.PENDING, const.REJECTED]
+            ).values_list("from_user_id", "to_user_id").iterator(chunk_size=10000)
+        exclusions = suggestions.to_matrix(ids, *suggestions.read_edges(declined))
+        build_seconds = time.perf_counter() - clock
+
+        clock = time.perf_counter()
+        written = self.store(ids, suggestions.top_suggestions(
+            adjacency, exclusions, rows, options["k"], options["chunk_size"]
+        ), options["chunk_size"], full=not incremental)
+        compute_seconds = time.perf_counter() - clock
+
+        run.finished_at = timezone.now()
+        # Only the edges read, which an incremental run limits to the neighbourhood.
+        run.edges = adjacency.nnz // 2
+        run.users = len(rows)
+        run.suggestions = written
+        run.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Incremental' if incremental else 'Full'} run: {run.edges} edges read in "
+            f"{build_seconds:.2f}s, {run.users} users recomputed and {written} suggestions "
+            f"stored in {compute_seconds:.2f}s ({run.users / max(compute_seconds, 1e-9):,.0f} users/s)."
+        ))
+
+    def get_changed_users(self, since):
+        """
+        Ids of the users with a friend request or friendship changed since `since`.
+
+        Friendships come from the FriendshipChange log, which also records the removed ones.
+        """
+
+        changed = set()
+        for from_user_id, to_user_id in FriendRequest.objects.filter(
+            updated_at__gte=since
+        ).values_list("from_user_id", "to_user_id").iterator():
+            changed.update((from_user_id, to_user_id))
+        for user_id, friend_id in FriendshipChange.objects.filter(
+            changed_at__gte=since
+        ).values_list("user_id", "friend_id").iterator():
+            changed.update((user_id, friend_id))
+        return changed
+
+    def read_neighbourhood(self, changed):
+        """
+        Yield the friendships, as (user_id, friend_id) pairs, of every user up to two hops from
+        `changed`.
+
+        The changed users and their friends are recomputed, and row u of A² sums the rows of
+        the friends of u: the rows of A of the friends of friends must be complete as well.
+        """
+
+        reached, frontier = set(), set(changed)
+        for _ in range(3):
+            reached |= frontier
+            found = set()
+            for user_id, friend_id in self.read_friendships(frontier):
+                found.add(friend_id)
+                yield user_id, friend_id
+            frontier = found - reached
+
+    def read_friendships(self, user_ids, batch_size=10000):
+        user_ids = sorted(user_ids)
+        for start in range(0, len(user_ids), batch_size):
+            yield from Friendship.objects.filter(
+                user_id__in=user_ids[start:start + batch_size]
+            ).values_list("user_id", "friend_id").iterator(chunk_size=batch_size)
+
+    def read_declined(self, user_ids, batch_size=10000):
+        """
+        Yield the pending and rejected requests sent or received by `user_ids`, as
+        (from_user_id, to_user_id) pairs.
+        """
+
+        declined = FriendRequest.objects.filter(
+            status__in=[const.PENDING, const.REJECTED]
+        ).values_list("from_user_id", "to_user_id")
+        user_ids = user_ids.tolist()
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            yield from declined.filter(from_user_id__in=batch).iterator(chunk_size=batch_size)
+            yield from declined.filter(to_user_id__in=batch).iterator(chunk_size=batch_size)
+
+    def get_rows(self, ids, user_ids):
+        """
+        Rows of `user_ids` in the sorted `ids`; unknown users are dropped.
+        """
+
+        user_ids = np.array(sorted(user_ids), dtype=np.int64)
+        rows = np.searchsorted(ids, user_ids)
+        known = rows < len(ids)
+        known[known] &= ids[rows[known]] == user_ids[known]
+        return rows[known]
+
+    def store(self, ids, ranked, batch_size, full):
+        """
+        Replace the stored suggestions of the recomputed users, one batch of users at a time.
+
+        A full run deletes and rewrites every row in a single transaction instead, so readers
+        never see the table empty or half written.
+        """
+
+        if full:
+            with transaction.atomic():
+                FriendSuggestion.objects.all().delete()
+                return self.write_batches(ids, ranked, batch_size, full)
+        return self.write_batches(ids, ranked, batch_size, full)
+
+    def write_batches(self, ids, ranked, batch_size, full):
+        written, users, batch = 0, [], []
+        for row, columns, scores in ranked:
+            user_id = int(ids[row])
+            users.append(user_id)
+            batch.extend(
+                FriendSuggestion(user_id=user_id, suggested_id=int(ids[column]), score=int(score))
+                for column, score in zip(columns, scores)
+            )
+            if len(users) >= batch_size:
+                written += self.write(users, batch, full)
+                users, batch = [], []
+        if users:
+            written += self.write(users, batch, full)
+        return written
+
+    def write(self, users, batch, full):
+        with transaction.atomic():
+            if not full:
+                FriendSuggestion.objects.filter(user_id__in=users).delete()
+            FriendSuggestion.objects.bulk_create(batch, batch_size=5000)
+        return len(batch)
+
+    def benchmark(self, options):
+        """
+        Time the matrix build and the chunked A² top-k on a uniform random graph.
+        """
+
+        generator = np.random.default_rng(0)
+        users, edges = options["synthetic_users"], options["synthetic_edges"]
+        ids = np.arange(users, dtype=np.int64)
+
+        clock = time.perf_counter()
+        sources, targets = generator.integers(0, users, edges), generator.integers(0, users, edges)
+        loops = sources == targets
+        adjacency = suggestions.to_matrix(ids, sources[~loops], targets[~loops])
+        declined = edges // 10
+        exclusions = suggestions.to_matrix(
+            ids, generator.integers(0, users, declined), generator.integers(0, users, declined)
+        )
+        build_seconds = time.perf_counter() - clock
+
+        clock = time.perf_counter()
+        stored = 0
+        for _, columns, _ in suggestions.top_suggestions(
+            adjacency, exclusions, ids, options["k"], options["chunk_size"]
+        ):
+            stored += len(columns)
+        compute_seconds = time.perf_counter() - clock
+
+        self.stdout.write(
+            f"Synthetic graph: {users:,} users, {adjacency.nnz // 2:,} edges.\n"
+            f"Build: {build_seconds:.2f}s ({edges / build_seconds:,.0f} edges/s).\n"
+            f"A² top-{options['k']}: {compute_seconds:.2f}s ({users / compute_seconds:,.0f} users/s, "
+            f"{adjacency.nnz // 2 / compute_seconds:,.0f} edges/s), {stored:,} suggestions."
+        )
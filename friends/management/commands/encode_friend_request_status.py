@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from friends.models import FriendRequest, FriendRequestStatusField
+
+
+class Command(BaseCommand):
+    """
+    Convert the varchar `FriendRequest.status` column of an existing database to smallint.
+
+    The automatic migration would cast 'pending' to smallint and fail, so this command has
+    to run before `migrate`. It rewrites the column in place with a CASE over the status
+    codes, rebuilds the partial indexes whose predicate compares the status, and reports the
+    table and index sizes before and after. It is a no-op on a fresh database and on a
+    column that has already been converted.
+    """
+
+    help = "Rewrite FriendRequest.status from varchar to its smallint code (run before migrate)."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stdout.write("Status encoding only applies to PostgreSQL, nothing to do.")
+            return
+
+        table = FriendRequest._meta.db_table
+        column = FriendRequest._meta.get_field("status").column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s",
+                [table, column],
+            )
+            row = cursor.fetchone()
+            if row is None or row[0] == "smallint":
+                self.stdout.write("FriendRequest.status is already encoded, nothing to do.")
+                return
+            existing_indexes = connection.introspection.get_constraints(cursor, table)
+
+        self.report_sizes("before", table)
+
+        # Partial indexes compare the status with a string literal and must be rebuilt.
+        partial_indexes = [
+            index
+            for index in FriendRequest._meta.indexes
+            if index.condition is not None and index.name in existing_indexes
+        ]
+        cases = " ".join(
+            f"WHEN %s THEN {code}" for code in FriendRequestStatusField.codes.values()
+        )
+        with connection.schema_editor() as editor:
+            for index in partial_indexes:
+                editor.remove_index(FriendRequest, index)
+            editor.execute(
+                f"ALTER TABLE {editor.quote_name(table)} "
+                f"ALTER COLUMN {editor.quote_name(column)} TYPE smallint "
+                f"USING CASE {editor.quote_name(column)} {cases} END",
+                list(FriendRequestStatusField.codes),
+            )
+            for index in partial_indexes:
+                editor.add_index(FriendRequest, index)
+
+        self.report_sizes("after", table)
+        self.stdout.write(self.style.SUCCESS("FriendRequest.status encoded as smallint."))
+
+    def report_sizes(self, label, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_relation_size(%s)), pg_size_pretty(pg_indexes_size(%s))",
+                [table, table],
+            )
+            table_size, indexes_size = cursor.fetchone()
+        self.stdout.write(f"{label}: table {table_size}, indexes {indexes_size}")
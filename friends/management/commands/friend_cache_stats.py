@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from friends.cache import friend_cache
+
+
+class Command(BaseCommand):
+    """
+    Print the hit rate of the friend list and inbox payload cache.
+
+    The counters live in the cache shared by the workers, so they cover every process using
+    it since the last reset.
+    """
+
+    help = "Show (and optionally reset) the friend payload cache hit rate."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters afterwards.")
+
+    def handle(self, *args, **options):
+        stats = friend_cache.stats()
+        hit_rate = "n/a" if stats["hit_rate"] is None else f"{stats['hit_rate']:.1%}"
+        self.stdout.write(f"hits {stats['hits']}, misses {stats['misses']}, hit rate {hit_rate}")
+        if options["reset"]:
+            friend_cache.reset_stats()
+            self.stdout.write("Counters reset.")
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from accounts.models import User
+from friends.models import FriendCounts, FriendRequest, Friendship
+import constants as const
+
+
+class Command(BaseCommand):
+    """
+    Find the FriendCounts rows that drifted from the friend requests they count, and repair them.
+
+    The actual counts are computed by the database with one correlated count per counter,
+    and only the users whose stored counters differ (or who have no row but should) are
+    returned. With `--fix` they are written back with `bulk_create(update_conflicts=True)`,
+    one batch at a time. Writes racing the repair can drift again; re-run until clean.
+    """
+
+    help = "Detect and repair drift in the denormalized friend counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Write the actual counts back.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows written per batch.")
+
+    def handle(self, *args, **options):
+        drifted = self.get_drifted().values_list(
+            "id", *[f"actual_{counter}" for counter in FriendCounts.COUNTERS]
+        )
+
+        batch, total = [], 0
+        for user_id, *counts in drifted.iterator(chunk_size=options["batch_size"]):
+            total += 1
+            if options["fix"]:
+                batch.append(FriendCounts(user_id=user_id, **dict(zip(FriendCounts.COUNTERS, counts))))
+                if len(batch) >= options["batch_size"]:
+                    self.write(batch)
+                    batch = []
+        if batch:
+            self.write(batch)
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Friend counts are in sync."))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Repaired the friend counts of {total} users."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{total} users have drifted friend counts, run with --fix."))
+
+    def get_drifted(self):
+        def count(queryset, column):
+            return Coalesce(
+                Subquery(
+                    queryset.filter(**{column: OuterRef("pk")})
+                    .order_by()
+                    .values(column)
+                    .annotate(count=Count("pk"))
+                    .values("count"),
+                    output_field=IntegerField(),
+                ),
+                Value(0),
+            )
+
+        pending = FriendRequest.objects.filter(status=const.PENDING)
+        users = User.objects.annotate(
+            actual_friends=count(Friendship.objects.all(), "user"),
+            actual_pending_received=count(pending, "to_user"),
+            actual_pending_sent=count(pending, "from_user"),
+            **{
+                f"stored_{counter}": Coalesce(F(f"friend_counts__{counter}"), Value(0))
+                for counter in FriendCounts.COUNTERS
+            },
+        )
+
+        drift = Q()
+        for counter in FriendCounts.COUNTERS:
+            drift |= ~Q(**{f"stored_{counter}": F(f"actual_{counter}")})
+        return users.filter(drift).order_by("id")
+
+    def write(self, batch):
+        FriendCounts.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=list(FriendCounts.COUNTERS),
+        )
@@ -1,16 +1,166 @@
-from django.db import models
+from collections import Counter, defaultdict, namedtuple
+from django.core import exceptions
+from django.db import connections, models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
+from django.utils.functional import cached_property
 from accounts.models import User
+from friends.cache import friend_cache
+import constants as const
 
 # Create your models here.
 
 
+class FriendRequestStatus(models.IntegerChoices):
+    """ Integer codes stored for the friend request status strings of constants.py. """
+
+    PENDING = 0, const.PENDING
+    ACCEPTED = 1, const.ACCEPTED
+    REJECTED = 2, const.REJECTED
+
+
+class FriendRequestStatusField(models.PositiveSmallIntegerField):
+    """
+    Stores the friend request status as a small integer.
+
+    Python code, the API and the serializers keep working with the status strings
+    ('pending', 'accepted', 'rejected'). The field converts them to their
+    `FriendRequestStatus` code on the way into the database and back to the string when
+    rows are loaded, so rows and indexes store two bytes instead of a varchar.
+    """
+
+    codes = {label: value for value, label in FriendRequestStatus.choices}
+    labels = {value: label for value, label in FriendRequestStatus.choices}
+
+    @cached_property
+    def validators(self):
+        # Values are checked against the choices; the integer range checks don't apply.
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        return self.labels.get(value, value)
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+        try:
+            return self.labels[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+    def get_prep_value(self, value):
+        if isinstance(value, str):
+            value = self.codes.get(value, value)
+        return super().get_prep_value(value)
+
+
+Transition = namedtuple("Transition", ["id", "from_user_id", "to_user_id", "previous_status"])
+
+
+class FriendRequestQuerySet(models.QuerySet):
+
+    def transition(self, status):
+        """
+        Move the friend requests of this queryset to `status` in a single statement.
+
+        Only the rows whose current status allows the transition (see
+        `FriendRequest.TRANSITIONS`) are changed. The rows are locked and updated with one
+        `UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING` on PostgreSQL, so of two
+        concurrent transitions on the same row exactly one sees the old status and wins.
+        The Friendship table and the FriendCounts counters are updated in the same transaction.
+
+        Returns the list of `Transition`s that happened, with the status each row had
+        before; an empty list means nothing matched or the transition was not allowed.
+        """
+
+        allowed_statuses = self.model.TRANSITIONS[status]
+        opts = self.model._meta
+        status_field = opts.get_field("status")
+        updated_at_field = opts.get_field("updated_at")
+        now = timezone.now()
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+
+        with transaction.atomic(using=self.db):
+            locked_rows = (
+                self.filter(status__in=allowed_statuses)
+                .select_for_update()
+                .values(locked_pk=models.F("pk"), locked_status=models.F("status"))
+            )
+            if connection.vendor == "postgresql":
+                subquery, params = locked_rows.query.get_compiler(using=self.db).as_sql()
+                table, pk = qn(opts.db_table), qn(opts.pk.column)
+                sql = (
+                    f"UPDATE {table} SET {qn(status_field.column)} = %s, "
+                    f"{qn(updated_at_field.column)} = %s "
+                    f"FROM ({subquery}) AS {qn('previous')} "
+                    f"WHERE {table}.{pk} = {qn('previous')}.{qn('locked_pk')} "
+                    f"RETURNING {table}.{pk}, "
+                    f"{table}.{qn(opts.get_field('from_user').column)}, "
+                    f"{table}.{qn(opts.get_field('to_user').column)}, "
+                    f"{qn('previous')}.{qn('locked_status')}"
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        sql,
+                        [
+                            status_field.get_db_prep_save(status, connection),
+                            updated_at_field.get_db_prep_save(now, connection),
+                            *params,
+                        ],
+                    )
+                    transitions = [
+                        Transition(pk, from_user_id, to_user_id, status_field.labels[previous])
+                        for pk, from_user_id, to_user_id, previous in cursor.fetchall()
+                    ]
+            else:
+                # Other databases can't return the joined row, read and update in two steps.
+                # The update repeats the status check, since the rows may not be locked.
+                transitions = [
+                    Transition(*row)
+                    for row in locked_rows.values_list(
+                        "pk", "from_user_id", "to_user_id", "status"
+                    )
+                ]
+                rows = self.model._default_manager.filter(
+                    pk__in=[friend_request.id for friend_request in transitions]
+                )
+                updated = rows.filter(status__in=allowed_statuses).update(
+                    status=status, updated_at=now
+                )
+                if updated < len(transitions):
+                    # Some rows were moved in between; keep the ones this call changed.
+                    changed = set(
+                        rows.filter(status=status, updated_at=now).values_list("pk", flat=True)
+                    )
+                    transitions = [t for t in transitions if t.id in changed]
+
+            # Accepting makes the users friends, rejecting an accepted request unfriends them.
+            pairs = [
+                (friend_request.from_user_id, friend_request.to_user_id)
+                for friend_request in transitions
+                if const.ACCEPTED in (status, friend_request.previous_status)
+            ]
+            if pairs and status == const.ACCEPTED:
+                Friendship.objects.connect_many(pairs)
+            elif pairs:
+                Friendship.objects.disconnect_many(pairs)
+            FriendCounts.objects.record_transitions(transitions, status)
+        return transitions
+
+
 class FriendRequest(models.Model):
     """
     This is the friend request model.
     
     The FriendRequest model is used to represent friend requests between users. It includes
     fields for the sending user (from_user), the receiving user (to_user), the status of the 
-    request, and the timestamp when the request was created.
+    request, and the timestamps when the request was created and last changed.
     """
     
     CHOICES = [
@@ -18,13 +168,321 @@ class FriendRequest(models.Model):
         ("accepted", "Accepted"),
         ("rejected", "Rejected"),
     ]
+    # Statuses a friend request may be moved to, and the statuses it may come from.
+    TRANSITIONS = {
+        const.ACCEPTED: (const.PENDING, const.REJECTED),
+        const.REJECTED: (const.PENDING, const.ACCEPTED),
+    }
     from_user = models.ForeignKey(User, related_name="sent_requests", on_delete=models.CASCADE)
     to_user = models.ForeignKey(User, related_name="received_requests", on_delete=models.CASCADE)
-    status = models.CharField(max_length=20,choices=CHOICES,default="pending",)
+    status = FriendRequestStatusField(choices=CHOICES,default="pending",)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FriendRequestQuerySet.as_manager()
 
     class Meta:
         unique_together = ("from_user", "to_user")
+        indexes = [
+            # Inbox by status, newest first; covers every column the inbox serializes.
+            models.Index(
+                fields=["to_user", "status", "-created_at", "-id"],
+                include=["from_user", "updated_at"],
+                name="friendreq_inbox_idx",
+            ),
+            # Pending inbox, the hottest path, over the pending rows only.
+            models.Index(
+                fields=["to_user", "-created_at", "-id"],
+                include=["from_user", "updated_at"],
+                condition=Q(status="pending"),
+                name="friendreq_pending_inbox_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.from_user} to {self.to_user} - {self.status}"
+
+
+class FriendshipManager(models.Manager):
+    """ Keeps both directions of a friendship edge in step. """
+
+    def connect(self, user_id, friend_id, since=None):
+        """
+        Create the symmetric pair of friendship rows between two users.
+        Existing rows are left untouched, so calling it twice is harmless.
+        """
+
+        return self.connect_many([(user_id, friend_id)], since=since)
+
+    def connect_many(self, pairs, since=None):
+        """
+        Create both directions of every (user_id, friend_id) pair with a single insert.
+        """
+
+        since = since or timezone.now()
+        FriendshipChange.objects.record(pairs, connected=True, changed_at=since)
+        return self.bulk_create(
+            [
+                self.model(user_id=user_id, friend_id=friend_id, since=since)
+                for pair in pairs
+                for user_id, friend_id in (pair, pair[::-1])
+            ],
+            ignore_conflicts=True,
+        )
+
+    def disconnect(self, user_id, friend_id):
+        """
+        Delete both directions of the friendship between two users.
+        """
+
+        return self.disconnect_many([(user_id, friend_id)])
+
+    def disconnect_many(self, pairs):
+        """
+        Delete both directions of every (user_id, friend_id) pair with a single delete.
+        """
+
+        edges = Q()
+        for user_id, friend_id in pairs:
+            edges |= Q(user_id=user_id, friend_id=friend_id)
+            edges |= Q(user_id=friend_id, friend_id=user_id)
+        if not edges:
+            return 0, {}
+        FriendshipChange.objects.record(pairs, connected=False)
+        return self.filter(edges).delete()
+
+    def mutual_friends(self, user_id, other_id):
+        """
+        Users who are friends with both users, as one query intersecting their edges.
+        """
+
+        return User.objects.filter(friend_of__user=user_id).filter(friend_of__user=other_id)
+
+    def mutual_counts(self, user_id, other_ids):
+        """
+        Number of mutual friends between `user_id` and each of `other_ids`, in one query.
+        Users without any mutual friend are left out.
+        """
+
+        return dict(
+            self.filter(
+                user__in=other_ids,
+                friend__in=self.filter(user=user_id).values("friend_id"),
+            )
+            .values("user_id")
+            .annotate(count=models.Count("id"))
+            .values_list("user_id", "count")
+        )
+
+
+class Friendship(models.Model):
+    """
+    Denormalized, symmetric friendship edge.
+
+    Every accepted FriendRequest is materialized as two rows, one per direction, so the
+    friends of a user are a single range scan on (user, since) instead of an OR across
+    the sent and received friend requests. Rows are written in the same transaction that
+    accepts a request and removed when the request is deleted; both are recorded in
+    FriendshipChange.
+    """
+
+    user = models.ForeignKey(User, related_name="friendships", on_delete=models.CASCADE)
+    friend = models.ForeignKey(User, related_name="friend_of", on_delete=models.CASCADE)
+    since = models.DateTimeField(default=timezone.now)
+
+    objects = FriendshipManager()
+
+    class Meta:
+        unique_together = ("user", "friend")
+        indexes = [models.Index(fields=["user", "since", "id"])]
+
+    def __str__(self):
+        return f"{self.user} - {self.friend}"
+
+
+class FriendshipChangeManager(models.Manager):
+
+    def record(self, pairs, connected, changed_at=None):
+        """
+        Log that the (user_id, friend_id) `pairs` were connected or disconnected. Called by
+        `FriendshipManager` inside the transaction that changes the Friendship rows.
+        """
+
+        changed_at = changed_at or timezone.now()
+        return self.bulk_create(
+            [
+                self.model(user_id=user_id, friend_id=friend_id, connected=connected, changed_at=changed_at)
+                for user_id, friend_id in pairs
+            ]
+        )
+
+
+class FriendshipChange(models.Model):
+    """
+    Log of the friendships made and removed, one row per pair.
+
+    The friend graph snapshot (see `friends.graph`) replays the changes made since it was
+    built, and incremental `compute_friend_suggestions` runs find the users to recompute in
+    it. The user columns are plain integers, so the removals of a deleted user's friendships
+    outlive the user. `build_friend_graph` prunes what neither needs anymore.
+    """
+
+    user_id = models.BigIntegerField()
+    friend_id = models.BigIntegerField()
+    connected = models.BooleanField()
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = FriendshipChangeManager()
+
+    def __str__(self):
+        return f"{self.user_id} {'+' if self.connected else '-'} {self.friend_id}"
+
+
+class FriendSuggestion(models.Model):
+    """
+    "People you may know" entry: `suggested` shares `score` friends with `user`.
+
+    Rows are written by the `compute_friend_suggestions` command, which keeps the top
+    suggestions of every user ranked by their number of mutual friends.
+    """
+
+    user = models.ForeignKey(User, related_name="friend_suggestions", on_delete=models.CASCADE)
+    suggested = models.ForeignKey(User, related_name="suggested_to", on_delete=models.CASCADE)
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("user", "suggested")
+        indexes = [models.Index(fields=["user", "-score", "suggested"])]
+
+    def __str__(self):
+        return f"{self.suggested} for {self.user} ({self.score})"
+
+
+class FriendSuggestionRun(models.Model):
+    """
+    One run of `compute_friend_suggestions`.
+
+    The start time of the last finished run is the watermark of the next incremental run,
+    which only recomputes the users around the edges that changed after it.
+    """
+
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)
+    edges = models.PositiveBigIntegerField(default=0)
+    users = models.PositiveIntegerField(default=0)
+    suggestions = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["finished_at"])]
+
+    def __str__(self):
+        return f"Suggestion run {self.started_at:%Y-%m-%d %H:%M} ({self.users} users)"
+
+
+class FriendCountsManager(models.Manager):
+    """ Applies counter deltas with `F()` updates, so concurrent writers never lose one. """
+
+    def apply(self, deltas, create=True):
+        """
+        Add `deltas`, a {user_id: {counter: delta}} dict, to the users' counters.
+
+        Missing rows are created first unless `create` is False; then every counter of
+        every user is changed by a single `UPDATE ... SET counter = counter + CASE ...`.
+        """
+
+        deltas = {user_id: changes for user_id, changes in deltas.items() if any(changes.values())}
+        if not deltas:
+            return 0
+        if create:
+            self.bulk_create([self.model(user_id=user_id) for user_id in deltas], ignore_conflicts=True)
+
+        updates = {}
+        for counter in self.model.COUNTERS:
+            whens = [
+                models.When(user_id=user_id, then=models.Value(changes[counter]))
+                for user_id, changes in deltas.items()
+                if changes.get(counter)
+            ]
+            if whens:
+                updates[counter] = models.F(counter) + models.Case(*whens, default=models.Value(0))
+        return self.filter(user_id__in=deltas).update(**updates)
+
+    def record_sent(self, pairs):
+        """ Count new pending requests, given as (from_user_id, to_user_id) pairs. """
+
+        deltas = defaultdict(Counter)
+        for from_user_id, to_user_id in pairs:
+            deltas[from_user_id]["pending_sent"] += 1
+            deltas[to_user_id]["pending_received"] += 1
+        return self.apply(deltas)
+
+    def record_transitions(self, transitions, status):
+        """ Count the `Transition`s returned by `FriendRequestQuerySet.transition`. """
+
+        deltas = defaultdict(Counter)
+        for friend_request in transitions:
+            self.add_removal(deltas, friend_request, friend_request.previous_status)
+            if status == const.ACCEPTED:
+                deltas[friend_request.from_user_id]["friends"] += 1
+                deltas[friend_request.to_user_id]["friends"] += 1
+        return self.apply(deltas)
+
+    def record_deleted(self, friend_request):
+        """ Count a deleted friend request; rows of users being deleted aren't recreated. """
+
+        deltas = defaultdict(Counter)
+        self.add_removal(deltas, friend_request, friend_request.status)
+        return self.apply(deltas, create=False)
+
+    @staticmethod
+    def add_removal(deltas, friend_request, status):
+        if status == const.PENDING:
+            deltas[friend_request.from_user_id]["pending_sent"] -= 1
+            deltas[friend_request.to_user_id]["pending_received"] -= 1
+        elif status == const.ACCEPTED:
+            deltas[friend_request.from_user_id]["friends"] -= 1
+            deltas[friend_request.to_user_id]["friends"] -= 1
+
+
+class FriendCounts(models.Model):
+    """
+    Denormalized friend and pending request counters of a user, for the app badge.
+
+    The counters are changed in the same transaction as the friend requests they count,
+    and `reconcile_friend_counts` repairs any drift. They are plain integers rather than
+    positive ones, so a drifted counter going below zero can't fail an accept or reject.
+    """
+
+    COUNTERS = ("friends", "pending_received", "pending_sent")
+
+    user = models.OneToOneField(
+        User, primary_key=True, related_name="friend_counts", on_delete=models.CASCADE
+    )
+    friends = models.IntegerField(default=0)
+    pending_received = models.IntegerField(default=0)
+    pending_sent = models.IntegerField(default=0)
+
+    objects = FriendCountsManager()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.friends} friends, {self.pending_received} pending"
+
+
+def post_delete_friend_request_receiver(sender, instance, *args, **kwargs):
+    if instance.status == const.ACCEPTED:
+        Friendship.objects.disconnect(instance.from_user_id, instance.to_user_id)
+    FriendCounts.objects.record_deleted(instance)
+    friend_cache.bump_on_commit(instance.from_user_id, instance.to_user_id)
+post_delete.connect(post_delete_friend_request_receiver, sender=FriendRequest)
+
+
+def pre_delete_user_receiver(sender, instance, *args, **kwargs):
+    # The cascade deletes the Friendship rows without going through FriendshipManager.
+    friend_ids = list(Friendship.objects.filter(user=instance.pk).values_list("friend_id", flat=True))
+    FriendshipChange.objects.record(
+        [(instance.pk, friend_id) for friend_id in friend_ids], connected=False
+    )
+    # The cached friend lists of the friends still show the user.
+    friend_cache.bump_on_commit(instance.pk, *friend_ids)
+pre_delete.connect(pre_delete_user_receiver, sender=User)
@@ -0,0 +1,95 @@
+"""
+Sparse matrix helpers behind the `compute_friend_suggestions` command.
+
+Users are mapped to the rows of a symmetric adjacency matrix A. Row u of A² counts, for every
+other user, the friends they share with u, so the best "people you may know" candidates of u
+are the largest entries of that row once u itself, its friends and the users it already has a
+pending or rejected request with are masked out.
+"""
+
+from array import array
+import numpy as np
+from scipy import sparse
+
+
+def read_ids(values):
+    """
+    Stream an iterable of integers into a compact int64 array.
+    """
+
+    return np.frombuffer(array("q", values), dtype=np.int64)
+
+
+def read_edges(pairs):
+    """
+    Stream an iterable of (source, target) pairs into two int64 arrays.
+    """
+
+    sources, targets = array("q"), array("q")
+    for source, target in pairs:
+        sources.append(source)
+        targets.append(target)
+    return np.frombuffer(sources, dtype=np.int64), np.frombuffer(targets, dtype=np.int64)
+
+
+def to_matrix(ids, sources, targets):
+    """
+    Symmetric 0/1 CSR matrix over the sorted user `ids` with an entry for every edge.
+
+    Edges whose endpoints are not in `ids` are dropped.
+    """
+
+    size = len(ids)
+    rows, columns = np.searchsorted(ids, sources), np.searchsorted(ids, targets)
+    known = (rows < size) & (columns < size)
+    known[known] &= (ids[rows[known]] == sources[known]) & (ids[columns[known]] == targets[known])
+    rows, columns = rows[known], columns[known]
+
+    both_ways = (np.concatenate([rows, columns]), np.concatenate([columns, rows]))
+    matrix = sparse.coo_matrix(
+        (np.ones(2 * len(rows), dtype=np.int32), both_ways), shape=(size, size)
+    ).tocsr()
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def neighbourhood(adjacency, rows):
+    """
+    `rows` together with all their neighbours, sorted.
+    """
+
+    neighbours = adjacency[rows].indices
+    return np.union1d(rows, neighbours)
+
+
+def top_suggestions(adjacency, exclusions, rows, k, chunk_size):
+    """
+    Yield `(row, columns, scores)` with the top `k` suggestions of every row in `rows`.
+
+    A² is computed `chunk_size` rows at a time, so memory stays bounded by the chunk instead
+    of the whole product. Scores are mutual friend counts, ties are broken by column.
+    """
+
+    size = adjacency.shape[0]
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        block = adjacency[chunk]
+        products = (block @ adjacency).tocsr()
+
+        itself = sparse.csr_matrix(
+            (np.ones(len(chunk), dtype=np.int32), (np.arange(len(chunk)), chunk)),
+            shape=(len(chunk), size),
+        )
+        masked = (block + exclusions[chunk] + itself) > 0
+        products = (products - products.multiply(masked)).tocsr()
+        products.eliminate_zeros()
+
+        for position, row in enumerate(chunk):
+            low, high = products.indptr[position], products.indptr[position + 1]
+            columns, scores = products.indices[low:high], products.data[low:high]
+            if len(scores) > k:
+                best = np.argpartition(-scores, k - 1)[:k]
+                columns, scores = columns[best], scores[best]
+            order = np.lexsort((columns, -scores))
+            yield row, columns[order], scores[order]
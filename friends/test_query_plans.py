@@ -0,0 +1,89 @@
+import random
+from unittest import skipUnless
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from accounts.models import User
+from friends.models import FriendRequest, Friendship
+import constants as const
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are checked on PostgreSQL only.")
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the queries behind the friends endpoints and fail on a sequential scan.
+
+    The querysets mirror the ones built by `friends.api.views`. The seeded tables are
+    ANALYZEd first, so the planner sees realistic statistics rather than empty tables.
+    """
+
+    users = 2000
+    requests_per_user = 20
+    tables = (FriendRequest._meta.db_table, Friendship._meta.db_table)
+
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        statuses = [const.PENDING, const.PENDING, const.ACCEPTED, const.REJECTED]
+        User.objects.bulk_create(
+            User(email=f"seed-{index}@plan.check", username=f"seed{index}", password="!")
+            for index in range(cls.users)
+        )
+        user_ids = list(User.objects.values_list("id", flat=True))
+
+        friend_requests, friendships = [], []
+        for from_user_id in user_ids:
+            for to_user_id in generator.sample(user_ids, cls.requests_per_user):
+                if to_user_id == from_user_id:
+                    continue
+                request_status = generator.choice(statuses)
+                friend_requests.append(
+                    FriendRequest(from_user_id=from_user_id, to_user_id=to_user_id, status=request_status)
+                )
+                if request_status == const.ACCEPTED:
+                    friendships.append(Friendship(user_id=from_user_id, friend_id=to_user_id))
+                    friendships.append(Friendship(user_id=to_user_id, friend_id=from_user_id))
+        FriendRequest.objects.bulk_create(friend_requests, batch_size=5000, ignore_conflicts=True)
+        Friendship.objects.bulk_create(friendships, batch_size=5000, ignore_conflicts=True)
+
+        with connection.cursor() as cursor:
+            for table in (User._meta.db_table, *cls.tables):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+
+        cls.user = User.objects.get(email="seed-0@plan.check")
+        cls.other_user = User.objects.get(email="seed-1@plan.check")
+
+    def get_querysets(self):
+        user, other_user = self.user, self.other_user
+        page_size = const.cursor_page_size + 1
+        yield "inbox (pending)", FriendRequest.objects.filter(
+            to_user=user, status=const.PENDING
+        ).order_by("-created_at", "-id")[:page_size]
+        yield "inbox (accepted)", FriendRequest.objects.filter(
+            to_user=user, status=const.ACCEPTED
+        ).order_by("-created_at", "-id")[:page_size]
+        yield "inbox (rejected)", FriendRequest.objects.filter(
+            to_user=user, status=const.REJECTED
+        ).order_by("-created_at", "-id")[:page_size]
+        yield "friends list", User.objects.filter(friend_of__user=user).annotate(
+            friends_since=F("friend_of__since"), friendship_id=F("friend_of__id")
+        ).order_by("-friends_since", "-friendship_id")[:page_size]
+        yield "send (already sent)", FriendRequest.objects.filter(
+            from_user=user, to_user=other_user
+        )[:1]
+        yield "accept / reject lookup", FriendRequest.objects.filter(
+            from_user=other_user, to_user=user
+        )
+
+    def test_friends_queries_use_an_index(self):
+        for name, queryset in self.get_querysets():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertFalse(self.has_sequential_scan(plan), f"{name}:\n{plan}")
+
+    def has_sequential_scan(self, plan):
+        for line in plan.splitlines():
+            line = line.strip(" -|`>")
+            if any(line.startswith(f"Seq Scan on {table}") for table in self.tables):
+                return True
+        return False
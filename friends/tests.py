@@ -1,3 +1,699 @@
-from django.test import TestCase
+import os
+import random
+from io import StringIO
+import tempfile
+import threading
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.tests import QueryBudgetMixin
+from accounts.models import User
+from friends.api.views import FriendEventsView
+from friends.api.serializers import BulkSendFriendRequestSerializer, SendFrientRequestSerializer
+from friends.cache import friend_cache
+from friends.events import MemoryBroker
+from friends.graph import FriendGraph
+from friends.models import FriendCounts, FriendRequest, Friendship, FriendSuggestion
+from ratelimit import CacheBackend, MemoryBackend, RateLimit
+import constants as const
 
-# Create your tests here.
+
+def create_users(count, prefix="user"):
+    return [
+        User.objects.create_user(
+            email=f"{prefix}-{index}@linkedu.test", password="Passw0rd!x", username=f"{prefix}{index}"
+        )
+        for index in range(count)
+    ]
+
+
+class FriendRequestTransitionTests(TestCase):
+
+    def setUp(self):
+        self.sender, self.receiver = create_users(2)
+        FriendRequest.objects.create(from_user=self.sender, to_user=self.receiver)
+        FriendCounts.objects.record_sent([(self.sender.id, self.receiver.id)])
+        self.friend_requests = FriendRequest.objects.filter(
+            from_user=self.sender, to_user=self.receiver
+        )
+
+    def test_accept_connects_users(self):
+        transitions = self.friend_requests.transition(const.ACCEPTED)
+
+        self.assertEqual([t.previous_status for t in transitions], [const.PENDING])
+        self.assertEqual(self.friend_requests.get().status, const.ACCEPTED)
+        self.assertEqual(Friendship.objects.filter(user=self.sender, friend=self.receiver).count(), 1)
+        self.assertEqual(Friendship.objects.filter(user=self.receiver, friend=self.sender).count(), 1)
+
+    def test_same_answer_is_applied_once(self):
+        self.assertEqual(len(self.friend_requests.transition(const.ACCEPTED)), 1)
+        self.assertEqual(self.friend_requests.transition(const.ACCEPTED), [])
+        self.assertEqual(self.friend_requests.get().status, const.ACCEPTED)
+
+        counts = FriendCounts.objects.get(user=self.receiver)
+        self.assertEqual((counts.friends, counts.pending_received), (1, 0))
+
+    def test_answer_can_be_changed(self):
+        self.friend_requests.transition(const.REJECTED)
+        transitions = self.friend_requests.transition(const.ACCEPTED)
+
+        self.assertEqual([t.previous_status for t in transitions], [const.REJECTED])
+        self.assertEqual(self.friend_requests.get().status, const.ACCEPTED)
+        counts = FriendCounts.objects.get(user=self.receiver)
+        self.assertEqual((counts.friends, counts.pending_received), (1, 0))
+
+    def test_rejecting_a_friend_removes_the_friendship(self):
+        self.friend_requests.transition(const.ACCEPTED)
+        client = APIClient()
+        client.force_authenticate(self.receiver)
+        friends_url = reverse("friends:list-friends-accepted-request")
+        self.assertEqual(
+            [friend["id"] for friend in client.get(friends_url).data["detail"]], [self.sender.id]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse("friends:reject-request"), {"request_id": self.sender.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Friendship.objects.filter(user__in=[self.sender, self.receiver]).exists())
+        self.assertEqual(client.get(friends_url).data["detail"], [])
+        for user in (self.sender, self.receiver):
+            self.assertEqual(FriendCounts.objects.get(user=user).friends, 0)
+
+
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def check_backend(self, backend, clock):
+        rate_limit = RateLimit("test", limit=3, window=60, backend=backend)
+        with mock.patch(clock, return_value=1000.0):
+            self.assertEqual([rate_limit.allow(1) for _ in range(4)], [True, True, True, False])
+            self.assertTrue(rate_limit.allow(2))
+            rate_limit.release(1)
+            self.assertEqual(rate_limit.acquire(1, 5), 1)
+        # A full window later the budget is back.
+        with mock.patch(clock, return_value=1000.0 + 2 * 60):
+            self.assertEqual(rate_limit.acquire(1, 5), 3)
+
+    def test_memory_backend(self):
+        self.check_backend(MemoryBackend(), "ratelimit.time.monotonic")
+
+    def test_cache_backend(self):
+        self.check_backend(CacheBackend(), "ratelimit.time.time")
+
+    def test_fourth_request_in_a_minute_is_refused(self):
+        sender, *receivers = create_users(6)
+        client = APIClient()
+        client.force_authenticate(sender)
+        url = reverse("friends:friend-request")
+
+        # Invalid requests don't use up the budget.
+        self.assertEqual(client.post(url, {"to_user": sender.id}).status_code, 400)
+        responses = [client.post(url, {"to_user": receiver.id}) for receiver in receivers[:4]]
+
+        self.assertEqual([response.status_code for response in responses], [201, 201, 201, 400])
+        self.assertEqual(responses[3].data["message"], SendFrientRequestSerializer.rate_limit_message)
+        self.assertEqual(FriendRequest.objects.filter(from_user=sender).count(), 3)
+
+
+class BulkSendFriendRequestTests(TestCase):
+
+    def test_requests_sent_concurrently_are_not_counted(self):
+        sender, *receivers = create_users(4)
+        to_users = [receiver.id for receiver in receivers]
+
+        def acquire(ident, amount=1):
+            # Sent by another request between the `already_sent` read and the insert.
+            FriendRequest.objects.create(from_user=sender, to_user=receivers[1])
+            return amount
+
+        serializer = BulkSendFriendRequestSerializer(
+            data={"to_users": to_users}, context={"request": mock.Mock(user=sender)}
+        )
+        serializer.is_valid(raise_exception=True)
+        with mock.patch.object(SendFrientRequestSerializer.rate_limit, "acquire", acquire):
+            results = serializer.save()
+
+        self.assertEqual(
+            [result["status"] for result in results], [const.SENT, const.FAILED, const.SENT]
+        )
+        self.assertEqual(results[1]["message"], "Friend request already sent.")
+        self.assertEqual(FriendRequest.objects.filter(from_user=sender).count(), 3)
+        self.assertEqual(FriendCounts.objects.get(user=sender).pending_sent, 2)
+
+
+class BulkFriendRequestTransitionTests(TestCase):
+
+    def setUp(self):
+        self.user, self.pending, self.accepted, self.rejected, self.receiver = create_users(5)
+        for sender, status in [
+            (self.pending, const.PENDING), (self.accepted, const.ACCEPTED), (self.rejected, const.REJECTED)
+        ]:
+            FriendRequest.objects.create(from_user=sender, to_user=self.user, status=status)
+        # Sent by the user, so not theirs to answer.
+        FriendRequest.objects.create(from_user=self.user, to_user=self.receiver)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, name, data):
+        response = self.client.post(reverse(f"friends:{name}"), data, format="json")
+        self.assertEqual(response.status_code, 200)
+        return {result["request_id"]: (result["status"], result["message"]) for result in response.data["detail"]}
+
+    def test_accept_outcome_per_id(self):
+        missing = User.objects.order_by("-id").first().id + 1
+        results = self.post("bulk-accept-request", {
+            "request_ids": [self.pending.id, self.accepted.id, self.rejected.id, self.receiver.id, missing],
+        })
+
+        self.assertEqual(results, {
+            self.pending.id: (const.ACCEPTED, "Friend request accepted."),
+            self.accepted.id: (const.FAILED, "Friend request already accepted."),
+            self.rejected.id: (const.ACCEPTED, "Friend request accepted."),
+            self.receiver.id: (const.FAILED, "Friend request not found."),
+            missing: (const.FAILED, "Friend request not found."),
+        })
+        self.assertEqual(FriendCounts.objects.get(user=self.user).friends, 2)
+        self.assertEqual(FriendRequest.objects.get(from_user=self.user).status, const.PENDING)
+
+    def test_reject_all_only_answers_pending_requests(self):
+        results = self.post("bulk-reject-request", {"all": True})
+
+        self.assertEqual(results, {self.pending.id: (const.REJECTED, "Friend request rejected.")})
+        self.assertEqual(FriendRequest.objects.get(from_user=self.accepted).status, const.ACCEPTED)
+
+    def test_request_ids_or_all(self):
+        for data in ({}, {"all": True, "request_ids": [self.pending.id]}, {"request_ids": []}):
+            response = self.client.post(reverse("friends:bulk-accept-request"), data, format="json")
+            self.assertEqual(response.status_code, 400, data)
+
+
+class FriendEventsViewTests(TestCase):
+
+    def setUp(self):
+        self.user, self.sender = create_users(2)
+        self.url = reverse("friends:friend-events")
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        self.broker = MemoryBroker(history=3)
+        self.enterContext(mock.patch("friends.events.get_broker", return_value=self.broker))
+        self.enterContext(mock.patch.object(const, "friend_events_keepalive", 0.05))
+        self.enterContext(mock.patch.object(const, "friend_events_stream_seconds", 0.2))
+
+    async def read_stream(self, count, **headers):
+        response = await self.async_client.get(self.url, headers={**self.headers, **headers})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = response.streaming_content
+        try:
+            return [await anext(content) for _ in range(count)]
+        finally:
+            await content.aclose()
+
+    def format(self, event):
+        return FriendEventsView.format(event.id, event.type, event.data).encode()
+
+    async def test_requires_a_token(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get(self.url, headers={"Authorization": "Bearer invalid"})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_streams_new_events(self):
+        self.broker.publish(self.user.id, "request_received", {})
+        response = await self.async_client.get(self.url, headers=self.headers)
+        content = response.streaming_content
+        try:
+            self.assertEqual(await anext(content), f"retry: {const.friend_events_retry}\n\n".encode())
+            # Events published before the stream opened are not replayed without Last-Event-ID.
+            self.assertEqual(await anext(content), b": keepalive\n\n")
+            event = self.broker.publish(self.user.id, "request_accepted", {"to_user": self.sender.id})
+            self.broker.publish(self.sender.id, "request_received", {})
+            self.assertEqual(await anext(content), self.format(event))
+        finally:
+            await content.aclose()
+
+    async def test_resumes_after_last_event_id(self):
+        first, *missed = [self.broker.publish(self.user.id, "request_received", {}) for _ in range(3)]
+
+        chunks = await self.read_stream(3, **{"Last-Event-ID": str(first.id)})
+
+        self.assertEqual(chunks[1:], [self.format(event) for event in missed])
+
+    async def test_resync_when_missed_events_are_gone(self):
+        last_id = self.broker.get_last_id(self.user.id)
+        published = [self.broker.publish(self.user.id, "request_received", {}) for _ in range(5)]
+
+        chunks = await self.read_stream(5, **{"Last-Event-ID": str(last_id)})
+
+        # Only the last 3 events are retained.
+        retained = published[2:]
+        self.assertEqual(
+            chunks[1:],
+            [FriendEventsView.format(retained[0].id - 1, "resync", {}).encode()]
+            + [self.format(event) for event in retained],
+        )
+
+    def test_friend_request_publishes_event(self):
+        client = APIClient()
+        client.force_authenticate(self.sender)
+        last_id = self.broker.get_last_id(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse("friends:friend-request"), {"to_user": self.user.id})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.broker.read(self.user.id, last_id),
+            [(last_id + 1, "request_received", {"from_user": self.sender.id, "to_user": self.user.id})],
+        )
+
+
+class FriendCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch.object(SendFrientRequestSerializer.rate_limit, "_backend", MemoryBackend()))
+        self.sender, self.receiver, self.other = create_users(3)
+        self.inbox_url = reverse("friends:list-friend-request") + f"?status={const.PENDING}"
+        self.friends_url = reverse("friends:list-friends-accepted-request")
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def get_ids(self, client, url, key="id"):
+        return [row[key] for row in client.get(url).data["detail"]]
+
+    def get_versions(self):
+        return [friend_cache.get_version(user.id) for user in (self.sender, self.receiver, self.other)]
+
+    def assertBumped(self, before, *users):
+        after = self.get_versions()
+        bumped = [user for user, old, new in zip((self.sender, self.receiver, self.other), before, after) if new != old]
+        self.assertEqual(bumped, list(users))
+
+    def send(self, sender, receiver):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.get_client(sender).post(reverse("friends:friend-request"), {"to_user": receiver.id})
+        self.assertEqual(response.status_code, 201)
+
+    def test_send_invalidates_the_inbox(self):
+        receiver_client = self.get_client(self.receiver)
+        self.assertEqual(self.get_ids(receiver_client, self.inbox_url), [])
+        versions = self.get_versions()
+
+        self.send(self.sender, self.receiver)
+
+        self.assertBumped(versions, self.sender, self.receiver)
+        self.assertEqual(len(self.get_ids(receiver_client, self.inbox_url)), 1)
+
+    def test_accept_invalidates_the_friends_of_both_users(self):
+        self.send(self.sender, self.receiver)
+        sender_client, receiver_client = self.get_client(self.sender), self.get_client(self.receiver)
+        self.assertEqual(self.get_ids(sender_client, self.friends_url), [])
+        self.assertEqual(len(self.get_ids(receiver_client, self.inbox_url)), 1)
+        versions = self.get_versions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = receiver_client.post(reverse("friends:accept-request"), {"request_id": self.sender.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertBumped(versions, self.sender, self.receiver)
+        self.assertEqual(self.get_ids(sender_client, self.friends_url), [self.receiver.id])
+        self.assertEqual(self.get_ids(receiver_client, self.inbox_url), [])
+
+    def test_deleting_a_friend_request_invalidates_both_users(self):
+        self.send(self.sender, self.receiver)
+        FriendRequest.objects.filter(from_user=self.sender).transition(const.ACCEPTED)
+        friend_cache.bump(self.sender.id, self.receiver.id)
+        sender_client = self.get_client(self.sender)
+        self.assertEqual(self.get_ids(sender_client, self.friends_url), [self.receiver.id])
+        versions = self.get_versions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendRequest.objects.get(from_user=self.sender).delete()
+
+        self.assertBumped(versions, self.sender, self.receiver)
+        self.assertEqual(self.get_ids(sender_client, self.friends_url), [])
+
+    def test_deleting_a_user_invalidates_their_friends_and_requests(self):
+        self.send(self.sender, self.receiver)
+        self.send(self.other, self.receiver)
+        FriendRequest.objects.filter(from_user=self.sender).transition(const.ACCEPTED)
+        friend_cache.bump(self.sender.id, self.receiver.id)
+        receiver_client = self.get_client(self.receiver)
+        self.assertEqual(self.get_ids(receiver_client, self.friends_url), [self.sender.id])
+        self.assertEqual(len(self.get_ids(receiver_client, self.inbox_url)), 1)
+        versions = self.get_versions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sender.delete()
+            self.other.delete()
+
+        self.assertBumped(versions, self.sender, self.receiver, self.other)
+        self.assertEqual(self.get_ids(receiver_client, self.friends_url), [])
+        self.assertEqual(self.get_ids(receiver_client, self.inbox_url), [])
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentFriendRequestTransitionTests(TransactionTestCase):
+    """
+    Concurrent transitions of the same request, which row locks serialize.
+
+    Needs row locks, so it only runs on PostgreSQL.
+    """
+
+    def setUp(self):
+        self.sender, self.receiver = create_users(2)
+        FriendRequest.objects.create(from_user=self.sender, to_user=self.receiver)
+        FriendCounts.objects.record_sent([(self.sender.id, self.receiver.id)])
+
+    def run_concurrently(self, statuses):
+        barrier = threading.Barrier(len(statuses))
+        results = [None] * len(statuses)
+
+        def answer(index, status):
+            try:
+                barrier.wait()
+                results[index] = FriendRequest.objects.filter(
+                    from_user=self.sender, to_user=self.receiver
+                ).transition(status)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=answer, args=item) for item in enumerate(statuses)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_accepts(self):
+        results = self.run_concurrently([const.ACCEPTED, const.ACCEPTED])
+
+        self.assertEqual(sorted(len(transitions) for transitions in results), [0, 1])
+        self.assertEqual(FriendCounts.objects.get(user=self.sender).friends, 1)
+
+    def test_concurrent_accept_and_reject(self):
+        results = self.run_concurrently([const.ACCEPTED, const.REJECTED])
+
+        # Each one sees the status left by the other, and the last one decides.
+        previous = sorted(transitions[0].previous_status for transitions in results)
+        self.assertIn(previous, [[const.ACCEPTED, const.PENDING], [const.PENDING, const.REJECTED]])
+        status = FriendRequest.objects.get(from_user=self.sender).status
+        self.assertEqual(
+            Friendship.objects.filter(user=self.sender).exists(), status == const.ACCEPTED
+        )
+        counts = FriendCounts.objects.get(user=self.sender)
+        self.assertEqual((counts.friends, counts.pending_sent), (int(status == const.ACCEPTED), 0))
+
+
+class MutualFriendsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = create_users(10, prefix="mutual")
+        self.ids = [user.id for user in self.users]
+        rng = random.Random(7)
+        pairs = [
+            (first, second)
+            for index, first in enumerate(self.ids)
+            for second in self.ids[index + 1:]
+            if rng.random() < 0.5
+        ]
+        Friendship.objects.connect_many(pairs)
+        self.friends = {user_id: set() for user_id in self.ids}
+        for first, second in pairs:
+            self.friends[first].add(second)
+            self.friends[second].add(first)
+        self.unknown_id = max(self.ids) + 100
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def expected(self, other_id):
+        return self.friends[self.ids[0]] & self.friends.get(other_id, set())
+
+    def get_mutual_friends(self, other_id):
+        url = reverse("friends:mutual-friends", args=[other_id])
+        params, ids = {const.page_size_query_param: 3}, []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [user["id"] for user in response.data["detail"]]
+            cursor = response.data["extra_information"]["next_cursor"]
+            if cursor is None:
+                return ids, response.data["extra_information"]["count"]
+            params[const.cursor_query_param] = cursor
+
+    def test_mutual_friends_match_brute_force(self):
+        for other_id in [*self.ids[1:], self.unknown_id]:
+            with self.subTest(other_id=other_id):
+                ids, count = self.get_mutual_friends(other_id)
+                expected = self.expected(other_id)
+                self.assertEqual(ids, sorted(expected, reverse=True))
+                self.assertEqual(count, len(expected))
+
+    def test_mutual_friends_with_oneself_is_refused(self):
+        response = self.client.get(reverse("friends:mutual-friends", args=[self.ids[0]]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_mutual_counts_match_brute_force(self):
+        user_ids = [*self.ids, self.unknown_id]
+        url = reverse("friends:mutual-friend-counts")
+
+        # Twice: computed, then served from the cache.
+        for _ in range(2):
+            response = self.client.get(url, {"user_ids": user_ids})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.data["detail"],
+                # With oneself, every friend is a mutual friend.
+                [{"user_id": user_id, "count": len(self.expected(user_id))} for user_id in user_ids],
+            )
+
+
+class ReconcileFriendCountsTests(TestCase):
+
+    def setUp(self):
+        self.users = create_users(4, prefix="counts")
+        first, second, third, fourth = self.users
+        for from_user, to_user in [(first, second), (first, third), (fourth, first)]:
+            FriendRequest.objects.create(from_user=from_user, to_user=to_user)
+            FriendCounts.objects.record_sent([(from_user.id, to_user.id)])
+        FriendRequest.objects.filter(from_user=first, to_user=second).transition(const.ACCEPTED)
+        self.expected = self.get_counts()
+
+    def get_counts(self):
+        return {
+            counts.user_id: (counts.friends, counts.pending_received, counts.pending_sent)
+            for counts in FriendCounts.objects.exclude(friends=0, pending_received=0, pending_sent=0)
+        }
+
+    def reconcile(self, *args):
+        stdout = StringIO()
+        call_command("reconcile_friend_counts", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_counts_in_sync(self):
+        self.assertEqual(
+            self.expected,
+            {
+                self.users[0].id: (1, 1, 1),
+                self.users[1].id: (1, 0, 0),
+                self.users[2].id: (0, 1, 0),
+                self.users[3].id: (0, 0, 1),
+            },
+        )
+        self.assertIn("in sync", self.reconcile("--fix"))
+
+    def test_drift_is_detected_and_fixed(self):
+        first, second, third, fourth = self.users
+        FriendCounts.objects.filter(user=first).update(friends=5, pending_received=0)
+        FriendCounts.objects.filter(user=third).delete()
+        # A stray friendship edge counts as a friend of the other user.
+        Friendship.objects.create(user=fourth, friend=second)
+
+        self.assertIn("3 users have drifted", self.reconcile())
+        self.assertNotEqual(self.get_counts(), self.expected)
+
+        self.assertIn("Repaired the friend counts of 3 users", self.reconcile("--fix", "--batch-size", "2"))
+        self.assertEqual(self.get_counts(), {**self.expected, fourth.id: (1, 0, 1)})
+        self.assertIn("in sync", self.reconcile())
+
+    def test_lost_friendships_are_rebuilt_then_counted(self):
+        first, second = self.users[:2]
+        Friendship.objects.filter(user__in=[first, second]).delete()
+        FriendCounts.objects.filter(user__in=[first, second]).update(friends=0)
+
+        call_command("backfill_friendships", stdout=StringIO())
+
+        self.assertIn("Repaired the friend counts of 2 users", self.reconcile("--fix"))
+        self.assertEqual(self.get_counts(), self.expected)
+
+
+class FriendGraphTests(TestCase):
+
+    def setUp(self):
+        self.users = create_users(6, prefix="graph")
+        for first, second in [(0, 1), (1, 2), (2, 3), (0, 4), (4, 5), (5, 3)]:
+            self.accept(first, second)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "friend_graph.bin")
+        self.graph = FriendGraph(self.path)
+        self.graph.check_interval = 0
+
+    def accept(self, first, second):
+        FriendRequest.objects.create(from_user=self.users[first], to_user=self.users[second])
+        FriendRequest.objects.filter(
+            from_user=self.users[first], to_user=self.users[second]
+        ).transition(const.ACCEPTED)
+
+    def get_path(self, source, target):
+        path = self.graph.shortest_path(self.users[source].id, self.users[target].id)
+        return path and [self.users.index(User(pk=user_id)) for user_id in path]
+
+    def test_friendship_table_without_snapshot(self):
+        self.assertIn(self.get_path(0, 3), [[0, 1, 2, 3], [0, 4, 5, 3]])
+
+    def test_snapshot_with_changes_made_after_it(self):
+        call_command("build_friend_graph", path=self.path, stdout=open(os.devnull, "w"))
+        self.assertEqual(len(self.get_path(0, 3)), 4)
+
+        self.accept(0, 3)
+        self.assertEqual(self.get_path(0, 3), [0, 3])
+
+        FriendRequest.objects.get(from_user=self.users[0], to_user=self.users[3]).delete()
+        self.users[1].delete()
+        self.assertEqual(self.get_path(0, 3), [0, 4, 5, 3])
+        self.assertIsNone(self.graph.shortest_path(self.users[0].id, self.users[1].id))
+
+
+class FriendSuggestionTests(TestCase):
+
+    def setUp(self):
+        self.users = create_users(10, prefix="suggestion")
+        for first, second in [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 7), (7, 8), (8, 9), (1, 7)]:
+            self.send(first, second, const.ACCEPTED)
+        self.send(0, 2)
+
+    def send(self, first, second, status=None):
+        FriendRequest.objects.create(from_user=self.users[first], to_user=self.users[second])
+        if status:
+            FriendRequest.objects.filter(
+                from_user=self.users[first], to_user=self.users[second]
+            ).transition(status)
+
+    def compute(self, **options):
+        call_command("compute_friend_suggestions", stdout=open(os.devnull, "w"), **options)
+        return set(FriendSuggestion.objects.values_list("user_id", "suggested_id", "score"))
+
+    def test_incremental_run_matches_a_full_run(self):
+        self.compute(full=True)
+        self.send(2, 6, const.ACCEPTED)
+        self.send(9, 3, const.REJECTED)
+        FriendRequest.objects.filter(from_user=self.users[4], to_user=self.users[5]).delete()
+
+        self.assertEqual(self.compute(), self.compute(full=True))
+
+    def test_incremental_run_sees_removed_friendships(self):
+        self.compute(full=True)
+        FriendRequest.objects.filter(from_user=self.users[8], to_user=self.users[9]).delete()
+
+        self.assertEqual(self.compute(), self.compute(full=True))
+
+
+class FriendQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def seed(self, size):
+        """
+        The calling user with `size` pending requests, friends, sent requests and strangers.
+        """
+
+        context = super().seed(size)
+        user = context["user"]
+        senders, friends, receivers, strangers = (
+            context["users"][index * size:(index + 1) * size] for index in range(4)
+        )
+
+        FriendRequest.objects.bulk_create(
+            [FriendRequest(from_user=sender, to_user=user) for sender in senders]
+            + [
+                FriendRequest(from_user=friend, to_user=user, status=const.ACCEPTED)
+                for friend in friends
+            ]
+            + [FriendRequest(from_user=user, to_user=receiver) for receiver in receivers]
+        )
+        Friendship.objects.connect_many([(user.id, friend.id) for friend in friends])
+
+        return {
+            **context,
+            "senders": [sender.id for sender in senders],
+            "friends": [friend.id for friend in friends],
+            "strangers": [stranger.id for stranger in strangers],
+        }
+
+    def get_scenarios(self):
+        return [
+            ("send request", lambda context: (
+                "post", reverse("friends:friend-request"), {"to_user": context["strangers"][0]}
+            )),
+            ("bulk send requests", lambda context: (
+                "post", reverse("friends:bulk-friend-request"), {"to_users": context["strangers"]}
+            )),
+            ("accept request", lambda context: (
+                "post", reverse("friends:accept-request"), {"request_id": context["senders"][0]}
+            )),
+            ("reject request", lambda context: (
+                "post", reverse("friends:reject-request"), {"request_id": context["senders"][0]}
+            )),
+            ("reject accepted request", lambda context: (
+                "post", reverse("friends:reject-request"), {"request_id": context["friends"][0]}
+            )),
+            ("bulk accept requests", lambda context: (
+                "post", reverse("friends:bulk-accept-request"), {"request_ids": context["senders"]}
+            )),
+            ("bulk accept mixed ids", lambda context: (
+                "post",
+                reverse("friends:bulk-accept-request"),
+                {"request_ids": context["senders"] + context["friends"] + context["strangers"]},
+            )),
+            ("bulk accept all", lambda context: (
+                "post", reverse("friends:bulk-accept-request"), {"all": True}
+            )),
+            ("bulk reject requests", lambda context: (
+                "post", reverse("friends:bulk-reject-request"), {"request_ids": context["senders"]}
+            )),
+            ("pending requests", lambda context: (
+                "get", reverse("friends:list-friend-request") + "?status=pending", {}
+            )),
+            ("friends list", lambda context: (
+                "get", reverse("friends:list-friends-accepted-request"), {}
+            )),
+            ("mutual friends", lambda context: (
+                "get", reverse("friends:mutual-friends", args=[context["friends"][0]]), {}
+            )),
+            ("friend counts", lambda context: (
+                "get", reverse("friends:friend-counts"), {}
+            )),
+            ("connection", lambda context: (
+                "get", reverse("friends:connection", args=[context["friends"][0]]), {}
+            )),
+            ("friend suggestions", lambda context: (
+                "get", reverse("friends:friend-suggestions"), {}
+            )),
+            ("mutual friend counts", lambda context: (
+                "get",
+                reverse("friends:mutual-friend-counts"),
+                {"user_ids": context["friends"] + context["strangers"]},
+            )),
+        ]
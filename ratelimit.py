@@ -0,0 +1,211 @@
+import math
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+
+class BaseBackend:
+    """
+    Storage for rate limit budgets.
+
+    A backend grants at most `limit` units per `window` seconds for a key. `acquire` must
+    be atomic: concurrent callers can never be granted more than the limit between them.
+    """
+
+    def acquire(self, key, limit, window, amount=1):
+        """
+        Consume up to `amount` units for `key` and return how many were granted.
+        """
+
+        raise NotImplementedError("Rate limit backends must implement acquire().")
+
+    def release(self, key, window, amount=1):
+        """
+        Hand back `amount` units granted by `acquire` but not used.
+        """
+
+        raise NotImplementedError("Rate limit backends must implement release().")
+
+
+class MemoryBackend(BaseBackend):
+    """
+    In-process sliding-window log.
+
+    Every granted unit is recorded with its timestamp and expires exactly `window` seconds
+    later. Budgets are per process, so this backend suits tests and single worker setups.
+    """
+
+    sweep_interval = 1000
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._logs = {}
+        self._calls = 0
+
+    def acquire(self, key, limit, window, amount=1):
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.sweep_interval == 0:
+                self._sweep(now, window)
+
+            log = self._logs.setdefault(key, deque())
+            while log and log[0] <= now - window:
+                log.popleft()
+
+            granted = max(0, min(amount, limit - len(log)))
+            log.extend([now] * granted)
+            if not log:
+                del self._logs[key]
+            return granted
+
+    def release(self, key, window, amount=1):
+        with self._lock:
+            log = self._logs.get(key)
+            for _ in range(min(amount, len(log or ()))):
+                log.pop()
+            if log is not None and not log:
+                del self._logs[key]
+
+    def _sweep(self, now, window):
+        """ Drop the logs whose newest entry has already left the window. """
+
+        for key in [key for key, log in self._logs.items() if not log or log[-1] <= now - window]:
+            del self._logs[key]
+
+
+class CacheBackend(BaseBackend):
+    """
+    Sliding-window counter on top of Django's cache framework.
+
+    Units are counted in fixed windows with the atomic `cache.incr`; the usage of the
+    sliding window is the current count plus the previous window's count weighted by how
+    much of it still overlaps. Units over the limit are handed back with `cache.decr`, so
+    the budget is shared by every worker that uses the same cache (memcached, redis).
+    """
+
+    key_prefix = "ratelimit"
+
+    def __init__(self, alias=None) -> None:
+        self.alias = alias or getattr(settings, "RATE_LIMIT_CACHE", "default")
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def acquire(self, key, limit, window, amount=1):
+        now = time.time()
+        index = int(now // window)
+        current_key = f"{self.key_prefix}:{key}:{index}"
+        previous_key = f"{self.key_prefix}:{key}:{index - 1}"
+
+        # The key lives for two windows so it can act as the previous window later on.
+        self.cache.add(current_key, 0, timeout=2 * window)
+        try:
+            current = self.cache.incr(current_key, amount)
+        except ValueError:
+            self.cache.add(current_key, amount, timeout=2 * window)
+            current = amount
+
+        previous = self.cache.get(previous_key, 0)
+        overlap = 1 - (now % window) / window
+        excess = math.ceil(previous * overlap + current - limit)
+        if excess <= 0:
+            return amount
+
+        excess = min(excess, amount)
+        try:
+            self.cache.decr(current_key, excess)
+        except ValueError:
+            pass
+        return amount - excess
+
+    def release(self, key, window, amount=1):
+        current_key = f"{self.key_prefix}:{key}:{int(time.time() // window)}"
+        try:
+            remaining = self.cache.decr(current_key, amount)
+        except ValueError:
+            return
+        if remaining < 0:
+            # The units were counted in the previous window, which ages out on its own.
+            self.cache.incr(current_key, -remaining)
+
+
+@lru_cache(maxsize=None)
+def get_backend(path=None):
+    """
+    Returns the shared backend instance configured by `settings.RATE_LIMIT_BACKEND`.
+    """
+
+    path = path or getattr(settings, "RATE_LIMIT_BACKEND", "ratelimit.CacheBackend")
+    return import_string(path)()
+
+
+class RateLimit:
+    """
+    A named limit of `limit` units per `window` seconds.
+
+    Limits are declared once, for example as a serializer or view attribute, and checked
+    per identity (usually the user id) without touching the database:
+
+        rate_limit = RateLimit("friend-request", limit=3, window=60)
+        if not rate_limit.allow(request.user.pk): ...
+    """
+
+    def __init__(self, name, limit, window, backend=None) -> None:
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def get_key(self, ident):
+        return f"{self.name}:{ident}"
+
+    def acquire(self, ident, amount=1):
+        """
+        Consume up to `amount` units of the budget and return how many were granted.
+        """
+
+        return self.backend.acquire(self.get_key(ident), self.limit, self.window, amount)
+
+    def release(self, ident, amount=1):
+        """
+        Hand back `amount` acquired units that were not used, e.g. when the insert failed.
+        """
+
+        if amount > 0:
+            self.backend.release(self.get_key(ident), self.window, amount)
+
+    def allow(self, ident):
+        return self.acquire(ident) == 1
+
+
+class RateLimitThrottle(BaseThrottle):
+    """
+    DRF throttle backed by a `RateLimit`, so views can declare limits as well:
+
+        class MyView(APIView):
+            throttle_classes = [RateLimitThrottle]
+            rate_limit = RateLimit("my-view", limit=10, window=60)
+    """
+
+    def allow_request(self, request, view):
+        rate_limit = getattr(view, "rate_limit", None)
+        if rate_limit is None:
+            return True
+
+        self.rate_limit = rate_limit
+        ident = request.user.pk if request.user.is_authenticated else self.get_ident(request)
+        return rate_limit.allow(ident)
+
+    def wait(self):
+        return self.rate_limit.window
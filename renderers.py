@@ -0,0 +1,94 @@
+import orjson
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renderer which serializes to JSON with orjson.
+
+    The output matches `rest_framework.renderers.JSONRenderer`: whatever orjson does not
+    handle natively (Decimal, lazy strings, querysets...) and datetimes, whose format DRF
+    shortens to milliseconds and "Z", are delegated to DRF's `JSONEncoder`. Like DRF, U+2028
+    and U+2029 are escaped, so the output can be embedded in a <script> tag.
+
+    One difference remains: orjson writes NaN and Infinity as `null`, where DRF's default
+    `STRICT_JSON` raises a ValueError. Views that must not send such floats as `null` have to
+    check them before rendering.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    encoder = JSONEncoder()
+
+    @classmethod
+    def dumps(cls, data):
+        ret = orjson.dumps(data, default=cls.encoder.default, option=cls.options)
+        # Both characters encode to 3 bytes starting with E2 80, skip the replaces otherwise.
+        if b"\xe2\x80" in ret:
+            ret = ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+        return ret
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return self.dumps(data)
+
+
+class StreamingPayload:
+    """
+    Iterates over the JSON encoding of an `st.get_payload` envelope chunk by chunk.
+
+    `rows` is consumed lazily, typically a `queryset.iterator()`, and every row is turned
+    into the `detail` list entry by `serialize`. `chunk_size` rows are encoded per chunk,
+    so memory stays flat whatever the number of rows.
+    """
+
+    def __init__(
+        self,
+        rows,
+        serialize,
+        message=None,
+        is_authenticated=False,
+        extra_information={},
+        chunk_size=500,
+    ):
+        self.rows = rows
+        self.serialize = serialize
+        self.message = message
+        self.is_authenticated = is_authenticated
+        self.extra_information = extra_information
+        self.chunk_size = chunk_size
+        self.dumps = ORJSONRenderer.dumps
+
+    def __iter__(self):
+        yield (
+            b'{"is_authenticated":' + self.dumps(self.is_authenticated)
+            + b',"message":' + self.dumps(self.message)
+            + b',"detail":['
+        )
+
+        chunk, separator = [], b""
+        for row in self.rows:
+            chunk.append(self.dumps(self.serialize(row)))
+            if len(chunk) >= self.chunk_size:
+                yield separator + b",".join(chunk)
+                chunk, separator = [], b","
+        if chunk:
+            yield separator + b",".join(chunk)
+
+        yield b'],"extra_information":' + self.dumps(self.extra_information) + b"}"
+
+
+class StreamingPayloadResponse(StreamingHttpResponse):
+    """
+    Streams a `StreamingPayload` as an application/json response.
+    """
+
+    def __init__(self, payload, *args, **kwargs):
+        kwargs.setdefault("content_type", ORJSONRenderer.media_type)
+        super().__init__(payload, *args, **kwargs)
@@ -1,9 +1,18 @@
 import constants as const
 import re
+import json
+import base64
+import hashlib
 from typing import Any
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 
 
 class Settings:
@@ -88,3 +97,213 @@ class CustomPageNumberPagination(PageNumberPagination):
 
 
 class StandardResultsSetPagination(CustomPageNumberPagination): ...
+
+
+class KeysetPagination:
+    """
+    Keyset (seek) pagination over a fixed column ordering.
+
+    Instead of OFFSET, every page seeks past the last row of the previous page with a
+    `WHERE (a, b) < (last_a, last_b)` style filter, so page N costs the same as page 1 and
+    no `COUNT(*)` is issued. The position of the last row is handed to the client as an
+    opaque, url-safe base64 cursor. The ordering must end with a unique column (usually
+    `id`) so that the position is unambiguous.
+
+    A total count is optional. With `count_mode="estimated"` the planner estimate from
+    `pg_class.reltuples` is returned for unfiltered querysets, and with `count_mode="cached"`
+    the exact count is cached for `count_cache_timeout` seconds. Clients may pick one of the
+    modes with the `count` query param.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = const.cursor_page_size
+    page_size_query_param = const.page_size_query_param
+    max_page_size = const.cursor_max_page_size
+    cursor_query_param = const.cursor_query_param
+    invalid_cursor_message = "Invalid cursor."
+    count_mode = None
+    count_query_param = const.count_query_param
+    count_cache_timeout = const.count_cache_timeout
+
+    def __init__(self, ordering=None, page_size=None, count_mode=None) -> None:
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        if page_size is not None:
+            self.page_size = page_size
+        if count_mode is not None:
+            self.count_mode = count_mode
+        self.next_position = None
+        self.count = None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        """
+        Returns the position encoded in the cursor query param, or None for the first page.
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+    def get_position(self, row):
+        """
+        Returns the ordering values of a row (model instance or `.values()` dict) as json-able data.
+        """
+
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            position.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return position
+
+    def get_seek_filter(self, position):
+        """
+        Builds the row-value comparison `(f1, f2, ...) </> (v1, v2, ...)` as an OR of prefixes.
+        """
+
+        seek, equal = Q(), Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            seek |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return seek
+
+    def get_count_mode(self, request):
+        count_mode = request.query_params.get(self.count_query_param, self.count_mode)
+        if count_mode in (const.ESTIMATED_COUNT, const.CACHED_COUNT):
+            return count_mode
+        return None
+
+    def get_cached_count(self, queryset):
+        queryset = queryset.order_by()
+        key = "keyset-count:" + hashlib.sha1(str(queryset.query).encode("utf-8")).hexdigest()
+        return cache.get_or_set(key, queryset.count, self.count_cache_timeout)
+
+    def get_estimated_count(self, queryset):
+        """
+        Returns the planner row estimate of the table, which costs a single catalog lookup.
+        Filtered querysets and other databases fall back to the cached exact count.
+        """
+
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql" or queryset.query.has_filters():
+            return self.get_cached_count(queryset)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+
+        # reltuples is -1 until the table has been vacuumed or analyzed.
+        if row is None or row[0] < 0:
+            return self.get_cached_count(queryset)
+        return row[0]
+
+    def get_total_count(self, queryset, request):
+        count_mode = self.get_count_mode(request)
+        if count_mode == const.ESTIMATED_COUNT:
+            return self.get_estimated_count(queryset)
+        if count_mode == const.CACHED_COUNT:
+            return self.get_cached_count(queryset)
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        self.count = self.get_total_count(queryset, request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_seek_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to learn whether a next page exists without counting.
+        rows = list(queryset[: page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = self.get_position(rows[-1]) if has_next else None
+        return rows
+
+    def get_next_cursor(self):
+        return self.encode_cursor(self.next_position)
+
+    def get_extra_information(self):
+        extra_information = {"next_cursor": self.get_next_cursor()}
+        if self.count is not None:
+            extra_information["count"] = self.count
+        return extra_information
+
+
+class ConditionalGetMixin:
+    """
+    APIView mixin answering `304 Not Modified` to polling clients whose data has not changed.
+
+    Views implement `get_etag_validators`, returning cheap values (aggregates, version
+    counters) which change whenever their response would, and call
+    `get_not_modified_response` at the start of `get`, before any serialization. The ETag
+    hashes the validators with the user, the full path and the renderer, and is sent back on
+    every successful response. Responses are marked private so that clients revalidate.
+    """
+
+    etag = None
+
+    def get_etag_validators(self, request):
+        raise NotImplementedError("Views must return the values their ETag is built from.")
+
+    def get_etag(self, request):
+        source = json.dumps(
+            [
+                request.user.pk,
+                request.get_full_path(),
+                request.accepted_renderer.format,
+                self.get_etag_validators(request),
+            ],
+            default=str,
+        )
+        return quote_etag(hashlib.sha1(source.encode()).hexdigest())
+
+    def get_not_modified_response(self, request):
+        """
+        Returns the 304 response when the request's `If-None-Match` matches, otherwise None.
+        """
+
+        self.etag = self.get_etag(request)
+        response = get_conditional_response(request._request, etag=self.etag)
+        if response is not None:
+            response["ETag"] = self.etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code == 200 and not response.has_header("ETag"):
+            response["ETag"] = self.etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response